@@ -3,15 +3,300 @@ ConsciousCart - Enhanced Agentic System
 With confidence scoring, analytics, and real web search
 """
 import os
+import csv
 import json
 import sqlite3
-from datetime import datetime, timedelta
-from anthropic import Anthropic
+import time
+from datetime import datetime
+from anthropic import Anthropic, APITimeoutError
 from dotenv import load_dotenv
 import re
+import threading
+
+import analytics
+import certifications
+from intent import FeedbackClassifier
+from snapshot import SnapshotStore
+from brand_names import normalize_brand_name
+from prefetch import Prefetcher
+from negative_cache import get_negative_cache, brand_from_question
+from brand_extractor import get_brand_extractor
+import response_cache
+from session_memory import SessionMemory
+import profiling
+import scheduler
+import telemetry
+import tracing
+import write_behind
 
 load_dotenv()
 
+# db_path -> FTS availability, for every database this process has already initialized
+_initialized_databases = {}
+_init_lock = threading.Lock()
+
+# How much each source's verdict counts; unknown sources get DEFAULT_SOURCE_AUTHORITY
+SOURCE_AUTHORITY = {
+    "leaping bunny": 1.0,
+    "cruelty-free international": 0.95,
+    "peta": 0.9,
+    "cruelty-free kitty": 0.75,
+    "logical harmony": 0.75,
+    "ethical elephant": 0.7,
+    "brand website": 0.4
+}
+DEFAULT_SOURCE_AUTHORITY = 0.5
+
+# One pass over search prose: source names open a finding, verdict words and years attach to it.
+# Negative phrases are listed before the positive words they contain.
+_SIGNAL_PATTERN = re.compile(
+    r"(?P<source>leaping bunny|cruelty[- ]free international|cruelty[- ]free kitty"
+    r"|logical harmony|ethical elephant|peta)"
+    r"|(?P<negative>not cruelty[- ]free|not certified|not on cruelty[- ]free list"
+    r"|tests? on animals|required by law|requires animal testing)"
+    r"|(?P<positive>cruelty[- ]free|certified|approved|verified)"
+    r"|\b(?P<year>20\d\d)\b",
+    re.IGNORECASE
+)
+
+FINDINGS_TOOL = {
+    "name": "record_findings",
+    "description": "Record what each source says about the query.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "summary": {
+                "type": "string",
+                "description": "Short prose summary, including parent company and any alternatives with prices"
+            },
+            "findings": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "source": {"type": "string", "description": "e.g. PETA, Leaping Bunny"},
+                        "verdict": {
+                            "type": "string",
+                            "enum": ["cruelty_free", "not_cruelty_free", "unclear"]
+                        },
+                        "date": {"type": "string", "description": "Year or date of the source's statement"},
+                        "notes": {"type": "string"}
+                    },
+                    "required": ["source", "verdict"]
+                }
+            }
+        },
+        "required": ["summary", "findings"]
+    }
+}
+
+
+DEFAULT_MODEL = "claude-sonnet-4-20250514"
+
+# Research prompt shared by live web_search calls and the offline batch job
+SEARCH_SYSTEM_PROMPT = """You are a research assistant specializing in cruelty-free beauty products. 
+
+When searching, look for:
+1. Brand's cruelty-free status (PETA, Leaping Bunny certification)
+2. Parent company information
+3. China market presence (mandatory animal testing)
+4. Alternative product recommendations with prices
+5. Multiple authoritative sources
+
+Report your results with the record_findings tool: one finding per source,
+with the source's verdict and the date of its statement."""
+
+SEARCH_USER_PROMPT = (
+    "Search for information about: {query}\n\n"
+    "Focus on cruelty-free certifications, parent companies, and reliable sources like PETA and Leaping Bunny."
+)
+
+# What a re-verification (refresh, batch job) searches for
+REVERIFY_QUERY = "{brand} cruelty-free status and parent company"
+
+
+def search_request(model: str, query: str) -> dict:
+    """messages.create parameters for one research query"""
+    return {
+        "model": model,
+        "max_tokens": 2000,
+        "temperature": 0.3,
+        "system": SEARCH_SYSTEM_PROMPT,
+        "messages": [{"role": "user", "content": SEARCH_USER_PROMPT.format(query=query)}],
+        "tools": [FINDINGS_TOOL],
+        "tool_choice": {"type": "tool", "name": "record_findings"}
+    }
+
+
+def findings_from_content(content: list):
+    """{"summary", "findings"} from a research response's content blocks, or None if it has neither"""
+    for block in content:
+        if getattr(block, "type", None) == "tool_use" and block.name == "record_findings":
+            # No findings from a live search is an answer too ("nothing reliable found")
+            return {"summary": block.input.get("summary", ""), "findings": block.input.get("findings") or []}
+    
+    # Model answered in prose instead of using the tool
+    result_text = "".join(block.text for block in content if hasattr(block, "text"))
+    if result_text:
+        return {"summary": result_text, "findings": parse_findings(result_text)}
+    return None
+
+
+def parse_findings(text: str) -> list:
+    """Extract per-source findings from search prose in a single regex pass"""
+    findings = []
+    current = None
+    
+    for match in _SIGNAL_PATTERN.finditer(text):
+        kind = match.lastgroup
+        if kind == "source":
+            current = {"source": match.group(kind), "verdict": "unclear", "date": None}
+            findings.append(current)
+        elif current is None:
+            continue
+        elif kind == "year":
+            current["date"] = current["date"] or match.group(kind)
+        elif kind == "negative":
+            current["verdict"] = "not_cruelty_free"
+        elif current["verdict"] == "unclear":
+            current["verdict"] = "cruelty_free"
+    
+    return findings
+
+
+def _source_authority(source: str) -> float:
+    """Authority weight for a source name"""
+    if source in SOURCE_AUTHORITY:
+        return SOURCE_AUTHORITY[source]
+    for name, weight in SOURCE_AUTHORITY.items():
+        if name in source:
+            return weight
+    return DEFAULT_SOURCE_AUTHORITY
+
+
+def _recency_weight(date) -> float:
+    """Down-weight old statements; undated ones count a bit less than fresh ones"""
+    match = re.search(r"(\d{4})", str(date or ""))
+    if not match:
+        return 0.7
+    age_years = datetime.now().year - int(match.group(1))
+    if age_years <= 1:
+        return 1.0
+    elif age_years <= 3:
+        return 0.8
+    return 0.5
+
+
+def score_findings(findings: list) -> dict:
+    """Weigh per-source verdicts by authority and recency into one verdict"""
+    weights = {True: 0.0, False: 0.0}
+    backing = {True: 0, False: 0}
+    seen = set()
+    
+    for finding in findings:
+        source = certifications.source_key(finding.get("source") or "")
+        if not source or source in seen:
+            continue
+        seen.add(source)
+        
+        verdict = finding.get("verdict")
+        if verdict not in ("cruelty_free", "not_cruelty_free"):
+            continue
+        
+        is_cf = verdict == "cruelty_free"
+        weight = _source_authority(source) * _recency_weight(finding.get("date"))
+        weights[is_cf] += weight
+        if weight >= 0.5:
+            backing[is_cf] += 1
+    
+    total = weights[True] + weights[False]
+    if total == 0:
+        return {"is_cruelty_free": None, "sources_count": 0, "has_conflicts": False}
+    
+    # Ties go to the conservative verdict
+    is_cf = weights[True] > weights[False]
+    return {
+        "is_cruelty_free": is_cf,
+        "sources_count": backing[is_cf],
+        "has_conflicts": weights[not is_cf] >= 0.25 * total
+    }
+
+
+# Confidence scoring, shared by VerificationResult and the vectorized rescorer (rescore.py).
+# (minimum backing sources, confidence), highest step first; fewer sources score BASE_CONFIDENCE
+CONFIDENCE_STEPS = [(4, 0.95), (3, 0.85), (2, 0.75)]
+BASE_CONFIDENCE = 0.5
+CONFLICT_PENALTY = 0.25
+
+# (minimum confidence, label), highest first; anything lower is "Low"
+CONFIDENCE_LABELS = [(0.9, "Very High"), (0.75, "High"), (0.5, "Medium")]
+
+
+def verification_ttl_days(confidence: float, has_conflicts: bool = False) -> int:
+    """Days a verification stays fresh: weak or conflicting evidence re-verifies sooner"""
+    if has_conflicts or confidence < 0.5:
+        return 3
+    elif confidence < 0.75:
+        return 14
+    elif confidence < 0.9:
+        return 60
+    return 120
+
+
+# Columns behind a check_database result, in the order _brand_row_result unpacks them
+BRAND_COLUMNS = f"""
+    name, is_cruelty_free, parent_company, explanation, sources,
+    last_verified, confidence, sources_count, expires_at, expires_at <= CURRENT_TIMESTAMP
+"""
+
+UPSERT_BRAND_SQL = """
+    INSERT INTO brands 
+    (name, is_cruelty_free, parent_company, explanation, sources,
+     confidence, sources_count, has_conflicts, last_verified, expires_at)
+    VALUES (:name, :is_cruelty_free, :parent_company, :explanation, :sources,
+            :confidence, :sources_count, :has_conflicts, CURRENT_TIMESTAMP, datetime('now', :ttl))
+    ON CONFLICT(name) DO UPDATE SET
+        is_cruelty_free = excluded.is_cruelty_free,
+        parent_company = excluded.parent_company,
+        explanation = excluded.explanation,
+        sources = excluded.sources,
+        confidence = excluded.confidence,
+        sources_count = excluded.sources_count,
+        has_conflicts = excluded.has_conflicts,
+        last_verified = excluded.last_verified,
+        expires_at = excluded.expires_at,
+        version = brands.version + 1
+"""
+
+
+# Append the brand's new current state to the verification log
+LOG_VERIFICATION_SQL = """
+    INSERT INTO verifications
+    (brand_id, brand_name, is_cruelty_free, confidence, sources, sources_count, origin)
+    SELECT id, name, is_cruelty_free, confidence, sources, sources_count, ?
+    FROM brands
+    WHERE name = ?
+"""
+
+
+def write_brand_records(cursor, records: list):
+    """Upsert verified brand records and log each verdict, in the caller's transaction.
+    
+    Upsert rather than INSERT OR REPLACE: REPLACE's implicit delete would
+    churn the id and bypass the FTS and analytics delete triggers.
+    """
+    cursor.executemany(UPSERT_BRAND_SQL, [
+        {**record, "ttl": f"+{record['ttl_days']} days"} for record in records
+    ])
+    cursor.executemany(LOG_VERIFICATION_SQL, [
+        (record.get("origin", "agent"), record["name"]) for record in records
+    ])
+    certifications.refresh_certifications(
+        cursor,
+        [record["name"] for record in records],
+        {record["name"]: record.get("certifications") for record in records}
+    )
+
 
 class UserProfile:
     """Tracks user preferences and learns from feedback"""
@@ -30,12 +315,15 @@ class UserProfile:
         self.rejected_brands = set()
         self.last_recommendation_price = None
     
-    def learn_from_feedback(self, feedback: str, context: dict):
-        """Learn from user's implicit and explicit feedback"""
+    def learn_from_feedback(self, feedback: str, context: dict, negated: set = None):
+        """Learn from user's implicit and explicit feedback, skipping intents the user negated"""
         feedback_lower = feedback.lower()
+        negated = negated or set()
         
         # Budget learning
-        if "expensive" in feedback_lower or "too much" in feedback_lower or "pricey" in feedback_lower:
+        if negated & {"budget_down", "budget_ok"}:
+            pass  # "not too expensive": nothing to learn about the budget
+        elif any(word in feedback_lower for word in ("expensive", "too much", "pricey", "overpriced")):
             if context.get("last_price"):
                 self.budget_max = int(context["last_price"] * 0.7)
                 print(f"[Profile] Learned budget_max: ${self.budget_max}")
@@ -46,15 +334,15 @@ class UserProfile:
                 print(f"[Profile] Learned budget_max: ${self.budget_max}")
         
         # Values learning
-        if "vegan" in feedback_lower:
+        if "vegan" in feedback_lower and "vegan" not in negated:
             self.values["vegan"] = True
             print(f"[Profile] Learned: User cares about vegan")
         
-        if "fragrance" in feedback_lower or "scent" in feedback_lower:
+        if ("fragrance" in feedback_lower or "scent" in feedback_lower) and "fragrance_free" not in negated:
             self.values["fragrance_free"] = True
             print(f"[Profile] Learned: User wants fragrance-free")
         
-        if "paraben" in feedback_lower:
+        if "paraben" in feedback_lower and "paraben_free" not in negated:
             self.values["paraben_free"] = True
             print(f"[Profile] Learned: User wants paraben-free")
     
@@ -116,36 +404,39 @@ class VerificationResult:
         self.is_cruelty_free = is_cruelty_free
         self.sources_count = sources_count
         self.has_conflicts = has_conflicts
+        self.findings = []
         self.confidence = self.calculate_confidence()
     
+    @classmethod
+    def from_findings(cls, brand: str, findings: list) -> "VerificationResult":
+        """Build a result from structured per-source findings"""
+        score = score_findings(findings)
+        result = cls(
+            brand=brand,
+            is_cruelty_free=score["is_cruelty_free"],
+            sources_count=score["sources_count"],
+            has_conflicts=score["has_conflicts"]
+        )
+        result.findings = findings
+        return result
+    
     def calculate_confidence(self) -> float:
         """Calculate confidence score 0.0-1.0"""
-        base = 0.5
-        
         # More sources = higher confidence
-        if self.sources_count >= 4:
-            base = 0.95
-        elif self.sources_count >= 3:
-            base = 0.85
-        elif self.sources_count >= 2:
-            base = 0.75
+        base = next(
+            (confidence for minimum, confidence in CONFIDENCE_STEPS if self.sources_count >= minimum),
+            BASE_CONFIDENCE
+        )
         
         # Conflicts reduce confidence
         if self.has_conflicts:
-            base -= 0.25
+            base -= CONFLICT_PENALTY
         
         return min(max(base, 0.1), 1.0)
     
     def get_confidence_label(self) -> str:
         """Get human-readable confidence label"""
-        if self.confidence >= 0.9:
-            return "Very High"
-        elif self.confidence >= 0.75:
-            return "High"
-        elif self.confidence >= 0.5:
-            return "Medium"
-        else:
-            return "Low"
+        return next((label for minimum, label in CONFIDENCE_LABELS if self.confidence >= minimum), "Low")
     
     def get_confidence_color(self) -> str:
         """Get color for UI"""
@@ -157,27 +448,201 @@ class VerificationResult:
             return "error"  # Red
 
 
+def brand_record(brand_name: str, is_cruelty_free: bool, parent_company: str = None,
+                 explanation: str = "", sources: list = None, confidence: float = None,
+                 sources_count: int = None, has_conflicts: bool = False, origin: str = "agent",
+                 findings: list = None) -> dict:
+    """Row for write_brand_records, scored and given a TTL the way save_to_database does"""
+    if sources_count is None:
+        sources_count = len({certifications.source_key(source) for source in sources or [] if source.strip()})
+    if confidence is None:
+        confidence = VerificationResult(brand_name, is_cruelty_free, sources_count, has_conflicts).confidence
+    return {
+        "name": brand_name,
+        "is_cruelty_free": is_cruelty_free,
+        "parent_company": parent_company,
+        "explanation": explanation,
+        "sources": ",".join(sources) if sources else "",
+        "confidence": confidence,
+        "sources_count": sources_count,
+        "has_conflicts": has_conflicts,
+        "ttl_days": verification_ttl_days(confidence, has_conflicts),
+        "origin": origin,
+        "certifications": certifications.finding_statuses(findings),  # each certifier's own verdict
+        "queued_at": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+    }
+
+
+class QueryBudget:
+    """Per-query limits on LLM calls, tool calls, wall time and tokens"""
+    
+    def __init__(self, max_llm_calls: int = 6, max_tool_calls: int = 10,
+                 deadline_seconds: float = 45.0, max_tokens: int = 30000):
+        self.max_llm_calls = max_llm_calls
+        self.max_tool_calls = max_tool_calls
+        self.deadline_seconds = deadline_seconds
+        self.max_tokens = max_tokens
+        
+        self.started_at = time.monotonic()
+        self.llm_calls = 0
+        self.tool_calls = 0
+        self.tokens_used = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.exhausted_by = None
+    
+    def remaining_seconds(self) -> float:
+        """Seconds left before the deadline"""
+        return self.deadline_seconds - (time.monotonic() - self.started_at)
+    
+    def remaining_tokens(self) -> int:
+        """Tokens left before the token budget runs out"""
+        return self.max_tokens - self.tokens_used
+    
+    def record_llm_call(self, response):
+        """Charge one LLM call and its token usage"""
+        self.llm_calls += 1
+        usage = getattr(response, "usage", None)
+        if usage:
+            self.input_tokens += usage.input_tokens or 0
+            self.output_tokens += usage.output_tokens or 0
+            self.tokens_used = self.input_tokens + self.output_tokens
+    
+    def record_tool_call(self):
+        """Charge one tool call"""
+        self.tool_calls += 1
+    
+    def check_llm(self) -> str:
+        """Return the name of the budget blocking another LLM call, or None"""
+        if self.llm_calls >= self.max_llm_calls:
+            self.exhausted_by = "max_llm_calls"
+        elif self.remaining_seconds() <= 0:
+            self.exhausted_by = "deadline"
+        elif self.remaining_tokens() <= 0:
+            self.exhausted_by = "max_tokens"
+        return self.exhausted_by
+    
+    def check_tool(self) -> str:
+        """Return the name of the budget blocking another tool call, or None"""
+        if self.tool_calls >= self.max_tool_calls:
+            self.exhausted_by = "max_tool_calls"
+        elif self.remaining_seconds() <= 0:
+            self.exhausted_by = "deadline"
+        return self.exhausted_by
+    
+    def to_dict(self) -> dict:
+        """Usage vs. limits, for tool-call metadata"""
+        return {
+            "llm_calls": f"{self.llm_calls}/{self.max_llm_calls}",
+            "tool_calls": f"{self.tool_calls}/{self.max_tool_calls}",
+            "elapsed_seconds": round(time.monotonic() - self.started_at, 2),
+            "deadline_seconds": self.deadline_seconds,
+            "tokens": f"{self.tokens_used}/{self.max_tokens}"
+        }
+
+
 class ConsciousCartAgent:
     """Enhanced agentic system with confidence scoring"""
     
-    def __init__(self):
+    def __init__(self, db_path: str = "brands.db", snapshot_path: str = None):
         self.client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-        self.model = "claude-sonnet-4-20250514"
-        self.db_path = "brands.db"
+        self.model = DEFAULT_MODEL
+        self.db_path = db_path
+        
+        # Optional read-only snapshot: alias resolution, brands SQLite lacks, and check_database if SQLite fails
+        snapshot_path = snapshot_path or os.getenv("CC_SNAPSHOT_PATH")
+        self.snapshot = SnapshotStore(snapshot_path) if snapshot_path else None
         self.conversation_history = []
         self.tool_calls = []
         
         # User profile
         self.user_profile = UserProfile()
+        self.feedback_classifier = FeedbackClassifier(
+            threshold=float(os.getenv("CC_LOCAL_FEEDBACK_THRESHOLD", 0.85))
+        )
         self.last_recommendation = None
+        self.last_alternatives = []
         
         # Context tracking
         self.last_brand_discussed = None
         self.last_product_type = None
         self.last_verification_result = None  # NEW: Store verification with confidence
         
-        # Initialize database
-        self._init_database()
+        # Facts established in earlier turns, replayed into each prompt under a token cap
+        self.memory = SessionMemory(max_tokens=int(os.getenv("CC_SESSION_MEMORY_TOKENS", 400)))
+        
+        # Per-query budgets (override via env or process_query(budget=...))
+        self.budget_limits = {
+            "max_llm_calls": int(os.getenv("CC_MAX_LLM_CALLS", 6)),
+            "max_tool_calls": int(os.getenv("CC_MAX_TOOL_CALLS", 10)),
+            "deadline_seconds": float(os.getenv("CC_QUERY_DEADLINE_SECONDS", 45)),
+            "max_tokens": int(os.getenv("CC_MAX_QUERY_TOKENS", 30000))
+        }
+        self._local = threading.local()  # per-thread request state (budget, stop reason)
+        
+        # Every LLM call queues here; chat turns outrank batch and background work
+        self.scheduler = scheduler.get_scheduler()
+        
+        # Initialize database (first session per database in this process only)
+        self._ensure_database()
+        
+        # Warm likely follow-up data after each brand turn unless CC_PREFETCH=0
+        # (CC_PREFETCH_WEB_PER_HOUR caps speculative live searches across all sessions)
+        self.prefetcher = None
+        if os.getenv("CC_PREFETCH", "1") != "0":
+            self.prefetcher = Prefetcher(
+                self, max_web_searches_per_hour=int(os.getenv("CC_PREFETCH_WEB_PER_HOUR", 10))
+            )
+        
+        # Brands whose searches found nothing reliable, remembered briefly across sessions
+        # (CC_NEGATIVE_CACHE_TTL_SECONDS=0 disables)
+        self.negative_cache = None
+        negative_ttl = float(os.getenv("CC_NEGATIVE_CACHE_TTL_SECONDS", 900))
+        if negative_ttl > 0:
+            self.negative_cache = get_negative_cache(
+                self.db_path, negative_ttl, int(os.getenv("CC_NEGATIVE_CACHE_SIZE", 1000))
+            )
+        
+        # Request traces for the Research Process waterfall (CC_TRACE_SAMPLE_RATE=0 disables);
+        # CC_TRACE_EXPORT_RATE of them go to a rotated CC_TRACE_PATH file ("" keeps all in memory)
+        trace_path = os.getenv("CC_TRACE_PATH", "traces.jsonl")
+        self.tracer = tracing.Tracer(
+            float(os.getenv("CC_TRACE_SAMPLE_RATE", 1.0)),
+            float(os.getenv("CC_TRACE_EXPORT_RATE", 0.01)),
+            tracing.get_exporter(
+                trace_path,
+                int(os.getenv("CC_TRACE_MAX_BYTES", 10 * 1024 * 1024)),
+                int(os.getenv("CC_TRACE_BACKUPS", 3))
+            ) if trace_path else None
+        )
+        self.last_trace = None
+        
+        # Sampling profiler, off unless CC_PROFILE_SAMPLE_RATE > 0 or process_query(profile=True)
+        self.profiler = profiling.get_profiler()
+        self.last_profile = None
+        
+        # Brands named in a query are looked up before the first LLM call unless CC_BRAND_EXTRACTOR=0
+        self.brand_extractor = None
+        if os.getenv("CC_BRAND_EXTRACTOR", "1") != "0":
+            self.brand_extractor = get_brand_extractor(self.db_path)
+        
+        # Final answers to repeat questions, shared across sessions (CC_RESPONSE_CACHE_SIZE=0 disables)
+        self.response_cache = None
+        response_cache_size = int(os.getenv("CC_RESPONSE_CACHE_SIZE", 500))
+        if response_cache_size > 0:
+            self.response_cache = response_cache.get_response_cache(
+                self.db_path, response_cache_size, float(os.getenv("CC_RESPONSE_CACHE_TTL_SECONDS", 3600))
+            )
+        
+        # Saves are group-committed in the background unless CC_WRITE_BEHIND=0
+        self.writer = None
+        if os.getenv("CC_WRITE_BEHIND", "1") != "0":
+            self.writer = write_behind.get_writer(self.db_path, write_brand_records)
+        
+        # Per-query telemetry for the inspector CLI, always written in the background
+        self.telemetry_writer = None
+        if os.getenv("CC_TELEMETRY", "1") != "0":
+            self.telemetry_writer = write_behind.get_writer(self.db_path, telemetry.write_query_records)
         
         # Define tools
         self.tools = [
@@ -195,6 +660,54 @@ class ConsciousCartAgent:
                     "required": ["brand_name"]
                 }
             },
+            {
+                "name": "search_database",
+                "description": "Full-text search over verified brands (name, parent company, explanation, certifications). Use this for questions about several brands, e.g. all brands of a parent company, vegan brands, or brands certified by Leaping Bunny.",
+                "input_schema": {
+                    "type": "object",
+                    "properties": {
+                        "query": {
+                            "type": "string",
+                            "description": "Keywords only, e.g. \"L'Oréal\" or \"vegan\". May be omitted when filtering by certifier"
+                        },
+                        "cruelty_free": {
+                            "type": "boolean",
+                            "description": "Only return brands with this cruelty-free status"
+                        },
+                        "certifier": {
+                            "type": "string",
+                            "description": "Only return brands certified cruelty-free by this certifier, e.g. Leaping Bunny or PETA"
+                        },
+                        "limit": {
+                            "type": "integer",
+                            "description": "Maximum number of brands to return (default 10, max 50)"
+                        }
+                    },
+                    "required": []
+                }
+            },
+            {
+                "name": "find_alternatives",
+                "description": "Find cruelty-free product alternatives with prices from the local catalog. The user's budget, values (vegan, fragrance-free, paraben-free) and rejected brands are applied automatically. Use this before web_search when recommending alternatives.",
+                "input_schema": {
+                    "type": "object",
+                    "properties": {
+                        "category": {
+                            "type": "string",
+                            "description": "Product category, e.g. mascara, foundation, lipstick"
+                        },
+                        "max_price": {
+                            "type": "number",
+                            "description": "Optional price cap for this request"
+                        },
+                        "limit": {
+                            "type": "integer",
+                            "description": "Maximum number of products to return (default 5)"
+                        }
+                    },
+                    "required": ["category"]
+                }
+            },
             {
                 "name": "web_search",
                 "description": "Search for information about cruelty-free status, certifications, or alternatives.",
@@ -229,11 +742,23 @@ class ConsciousCartAgent:
             }
         ]
     
+    @property
+    def current_budget(self) -> QueryBudget:
+        """Budget of the query running on this thread (background prefetch has none)"""
+        return getattr(self._local, "budget", None)
+    
+    @current_budget.setter
+    def current_budget(self, budget: QueryBudget):
+        self._local.budget = budget
+    
     def _init_database(self):
         """Initialize SQLite database"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
+        # WAL lets sessions keep reading while the background writer commits
+        cursor.execute("PRAGMA journal_mode=WAL")
+        
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS brands (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -247,10 +772,158 @@ class ConsciousCartAgent:
             )
         """)
         
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS products (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                brand TEXT NOT NULL,
+                name TEXT NOT NULL,
+                category TEXT NOT NULL,
+                price FLOAT NOT NULL,
+                is_vegan BOOLEAN DEFAULT 0,
+                is_fragrance_free BOOLEAN DEFAULT 0,
+                is_paraben_free BOOLEAN DEFAULT 0,
+                UNIQUE(brand, name)
+            )
+        """)
+        # find_alternatives filters on category (+ vegan) and sorts by price
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_category_price ON products(category, price)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_category_vegan_price ON products(category, is_vegan, price)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_brand ON products(brand)")
+        
+        # Append-only log of every verdict; brands holds the current state
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS verifications (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                brand_id INTEGER NOT NULL,
+                brand_name TEXT NOT NULL,
+                is_cruelty_free BOOLEAN NOT NULL,
+                confidence FLOAT,
+                sources TEXT,
+                sources_count INTEGER,
+                origin TEXT NOT NULL,
+                verified_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_verifications_brand_time ON verifications(brand_id, verified_at)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_verifications_time ON verifications(verified_at)")
+        
+        self._migrate_database(cursor)
+        self._init_search_index(cursor)
+        analytics.init_analytics(cursor)
+        telemetry.init_telemetry(cursor)
+        certifications.init_certifications(cursor)
+        
         conn.commit()
         conn.close()
         
         self._seed_database()
+        self._backfill_expiry()
+        self._backfill_history()
+        self._backfill_certifications()
+    
+    def _ensure_database(self):
+        """Schema, migrations, seeds and backfills once per database per process; later sessions only read"""
+        with _init_lock:
+            # A database file deleted since (tests, load test reruns) is built again
+            if self.db_path not in _initialized_databases or not os.path.exists(self.db_path):
+                self._init_database()
+                _initialized_databases[self.db_path] = self.fts_enabled
+            self.fts_enabled = _initialized_databases[self.db_path]
+    
+    def _migrate_database(self, cursor):
+        """Add columns introduced after the original schema"""
+        cursor.execute("PRAGMA table_info(brands)")
+        columns = {row[1] for row in cursor.fetchall()}
+        
+        new_columns = {
+            "sources_count": "INTEGER DEFAULT 0",
+            "has_conflicts": "BOOLEAN DEFAULT 0",
+            "expires_at": "TIMESTAMP",
+            "category": "TEXT",
+            "price_tier": "TEXT",
+            "version": "INTEGER NOT NULL DEFAULT 0"  # bumped on every update; keys the response cache
+        }
+        for column, definition in new_columns.items():
+            if column not in columns:
+                cursor.execute(f"ALTER TABLE brands ADD COLUMN {column} {definition}")
+        
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_brands_expires_at ON brands(expires_at)")
+    
+    def _init_search_index(self, cursor):
+        """Create the FTS5 index over brands, kept in sync by triggers"""
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'brands_fts'")
+        exists = cursor.fetchone() is not None
+        
+        try:
+            cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS brands_fts USING fts5(
+                    name, parent_company, explanation, sources,
+                    content='brands', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2'
+                )
+            """)
+        except sqlite3.OperationalError as e:
+            print(f"[Database] FTS5 unavailable, search_database will scan: {e}")
+            self.fts_enabled = False
+            return
+        
+        # Confidence, expiry and version updates don't touch indexed text; databases created
+        # before the trigger was column-scoped re-indexed the row on every update
+        cursor.execute("SELECT sql FROM sqlite_master WHERE name = 'brands_fts_au'")
+        row = cursor.fetchone()
+        if row and "UPDATE OF" not in row[0]:
+            cursor.execute("DROP TRIGGER brands_fts_au")
+        
+        cursor.executescript("""
+            CREATE TRIGGER IF NOT EXISTS brands_fts_ai AFTER INSERT ON brands BEGIN
+                INSERT INTO brands_fts(rowid, name, parent_company, explanation, sources)
+                VALUES (new.id, new.name, new.parent_company, new.explanation, new.sources);
+            END;
+            CREATE TRIGGER IF NOT EXISTS brands_fts_ad AFTER DELETE ON brands BEGIN
+                INSERT INTO brands_fts(brands_fts, rowid, name, parent_company, explanation, sources)
+                VALUES ('delete', old.id, old.name, old.parent_company, old.explanation, old.sources);
+            END;
+            CREATE TRIGGER IF NOT EXISTS brands_fts_au
+            AFTER UPDATE OF name, parent_company, explanation, sources ON brands BEGIN
+                INSERT INTO brands_fts(brands_fts, rowid, name, parent_company, explanation, sources)
+                VALUES ('delete', old.id, old.name, old.parent_company, old.explanation, old.sources);
+                INSERT INTO brands_fts(rowid, name, parent_company, explanation, sources)
+                VALUES (new.id, new.name, new.parent_company, new.explanation, new.sources);
+            END;
+        """)
+        
+        # Index rows that existed before the FTS table did
+        if not exists:
+            cursor.execute("INSERT INTO brands_fts(brands_fts) VALUES ('rebuild')")
+        self.fts_enabled = True
+    
+    def _backfill_expiry(self):
+        """Score rows saved before confidence-aware TTLs by their sources and give them an expiry"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT id, name, is_cruelty_free, sources, has_conflicts, last_verified
+            FROM brands
+            WHERE expires_at IS NULL
+        """)
+        
+        updates = []
+        for brand_id, name, is_cf, sources, has_conflicts, last_verified in cursor.fetchall():
+            sources_count = len({certifications.source_key(s) for s in (sources or "").split(",") if s.strip()})
+            # Not the column's 0.9 default: a single-source row shouldn't get the longest TTL
+            confidence = VerificationResult(name, bool(is_cf), sources_count, bool(has_conflicts)).confidence
+            ttl_days = verification_ttl_days(confidence, bool(has_conflicts))
+            updates.append((sources_count, confidence, last_verified, f"+{ttl_days} days", brand_id))
+        
+        cursor.executemany("""
+            UPDATE brands
+            SET sources_count = ?, confidence = ?, expires_at = datetime(?, ?)
+            WHERE id = ?
+        """, updates)
+        
+        conn.commit()
+        conn.close()
     
     def _seed_database(self):
         """Pre-populate with known brands"""
@@ -265,6 +938,29 @@ class ConsciousCartAgent:
             ("Revlon", False, None, "Not cruelty-free", "PETA"),
             ("Urban Decay", True, "L'Oréal", "Maintains cruelty-free despite parent", "Leaping Bunny"),
             ("Too Faced", True, "Estée Lauder", "Cruelty-free certified", "Leaping Bunny"),
+            ("Essence", True, "cosnova", "Cruelty-free verified, no animal testing", "PETA"),
+            ("Milk Makeup", True, None, "Leaping Bunny approved, vegan formulas", "Leaping Bunny"),
+            ("Physicians Formula", True, None, "Certified cruelty-free", "Leaping Bunny"),
+            ("Cover FX", True, None, "Luxury cruelty-free option", "Leaping Bunny"),
+        ]
+        
+        # (brand, product, category, price, vegan, fragrance-free, paraben-free)
+        known_products = [
+            ("e.l.f. Cosmetics", "Big Mood Mascara", "mascara", 7, True, False, True),
+            ("Essence", "Lash Princess Mascara", "mascara", 5, True, False, True),
+            ("Pacifica", "Dream Big Mascara", "mascara", 12, True, False, True),
+            ("Milk Makeup", "Kush Mascara", "mascara", 24, True, False, True),
+            ("Too Faced", "Better Than Sex Mascara", "mascara", 29, False, False, False),
+            ("e.l.f. Cosmetics", "Flawless Finish Foundation", "foundation", 7, True, False, True),
+            ("Physicians Formula", "Healthy Foundation", "foundation", 13, False, True, True),
+            ("Pacifica", "Alight Multi-Mineral Foundation", "foundation", 14, True, True, True),
+            ("Fenty Beauty", "Pro Filt'r Soft Matte Foundation", "foundation", 40, False, False, True),
+            ("Cover FX", "Power Play Foundation", "foundation", 48, True, True, True),
+            ("e.l.f. Cosmetics", "Hydrating Camo Concealer", "concealer", 7, True, False, True),
+            ("Urban Decay", "Quickie Concealer", "concealer", 32, False, False, True),
+            ("e.l.f. Cosmetics", "O Face Satin Lipstick", "lipstick", 6, True, False, True),
+            ("Milk Makeup", "Lip Color", "lipstick", 24, True, False, True),
+            ("Fenty Beauty", "Gloss Bomb", "lip gloss", 21, False, False, True),
         ]
         
         conn = sqlite3.connect(self.db_path)
@@ -280,116 +976,550 @@ class ConsciousCartAgent:
             except:
                 pass
         
+        cursor.executemany("""
+            INSERT OR IGNORE INTO products
+            (brand, name, category, price, is_vegan, is_fragrance_free, is_paraben_free)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, known_products)
+        
         conn.commit()
         conn.close()
     
+    def import_brands_csv(self, csv_path: str) -> int:
+        """Bulk-import a brands CSV (brand, cruelty_free, parent_company, category, price_tier)"""
+        rows = []
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                name = (row.get("brand") or row.get("brand_name") or row.get("name") or "").strip()
+                if not name:
+                    continue
+                is_cf = str(row.get("cruelty_free", "")).strip().lower() in ("true", "1", "yes", "cruelty-free")
+                confidence = VerificationResult(name, is_cf, 1).confidence
+                rows.append((
+                    name, is_cf, (row.get("parent_company") or "").strip() or None,
+                    "Imported from PETA brand list", "PETA", confidence, 1,
+                    f"+{verification_ttl_days(confidence)} days",
+                    (row.get("category") or "").strip() or None,
+                    (row.get("price_tier") or "").strip() or None
+                ))
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        existing = {}
+        for i in range(0, len(rows), 500):
+            chunk = [row[0] for row in rows[i:i + 500]]
+            cursor.execute(f"""
+                SELECT name, is_cruelty_free FROM brands WHERE name IN ({",".join("?" * len(chunk))})
+            """, chunk)
+            existing.update((name, bool(is_cf)) for name, is_cf in cursor.fetchall())
+        
+        # New brands and flipped verdicts take every verdict column from the list together;
+        # where the list agrees, the researched row stays and only the catalog columns fill in
+        verdicts = [row for row in rows if existing.get(row[0]) != row[1]]
+        agreeing = [row for row in rows if existing.get(row[0]) == row[1]]
+        
+        # One transaction; the FTS and analytics triggers update incrementally per row
+        cursor.executemany("""
+            INSERT INTO brands
+            (name, is_cruelty_free, parent_company, explanation, sources, confidence,
+             sources_count, last_verified, expires_at, category, price_tier)
+            VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, datetime('now', ?), ?, ?)
+            ON CONFLICT(name) DO UPDATE SET
+                is_cruelty_free = excluded.is_cruelty_free,
+                parent_company = COALESCE(excluded.parent_company, brands.parent_company),
+                explanation = excluded.explanation,
+                sources = excluded.sources,
+                confidence = excluded.confidence,
+                sources_count = excluded.sources_count,
+                has_conflicts = 0,
+                last_verified = excluded.last_verified,
+                expires_at = excluded.expires_at,
+                category = COALESCE(excluded.category, brands.category),
+                price_tier = COALESCE(excluded.price_tier, brands.price_tier),
+                version = brands.version + 1
+        """, verdicts)
+        cursor.executemany("""
+            UPDATE brands
+            SET parent_company = COALESCE(parent_company, ?),
+                category = COALESCE(?, category),
+                price_tier = COALESCE(?, price_tier),
+                version = version + 1
+            WHERE name = ?
+        """, [(row[2], row[8], row[9], row[0]) for row in agreeing])
+        cursor.executemany(LOG_VERIFICATION_SQL, [("import", row[0]) for row in verdicts])
+        certifications.refresh_certifications(cursor, [row[0] for row in verdicts])
+        conn.commit()
+        conn.close()
+        
+        if self.brand_extractor:
+            for row in rows:
+                self.brand_extractor.add(row[0])
+        
+        print(f"[Database] Imported {len(rows)} brands from {csv_path}")
+        return len(rows)
+    
+    def _backfill_history(self):
+        """Start the log for brands that have none yet (seeds, pre-log rows)"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO verifications
+            (brand_id, brand_name, is_cruelty_free, confidence, sources, sources_count, origin, verified_at)
+            SELECT id, name, is_cruelty_free, confidence, sources, sources_count, 'seed', last_verified
+            FROM brands b
+            WHERE NOT EXISTS (SELECT 1 FROM verifications v WHERE v.brand_id = b.id)
+        """)
+        conn.commit()
+        conn.close()
+    
+    def _backfill_certifications(self):
+        """Migrate comma-joined sources into certification rows for brands that have none yet"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        migrated = certifications.backfill_certifications(cursor)
+        conn.commit()
+        conn.close()
+        
+        if migrated:
+            print(f"[Database] Migrated {migrated} certifications from brand sources")
+    
+    def get_brand_history(self, brand_name: str, limit: int = 50) -> list:
+        """Every logged verdict for a brand, newest first, flagging status flips"""
+        if self.writer:
+            self.writer.flush()
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT * FROM (
+                SELECT v.id, v.brand_name, v.is_cruelty_free, v.confidence, v.sources, v.origin, v.verified_at,
+                       LAG(v.is_cruelty_free) OVER (ORDER BY v.verified_at, v.id) AS previous
+                FROM verifications v
+                JOIN brands b ON b.id = v.brand_id
+                WHERE LOWER(b.name) = LOWER(?)
+            )
+            ORDER BY verified_at DESC, id DESC
+            LIMIT ?
+        """, (brand_name, limit))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [
+            {
+                "id": entry_id,
+                "brand_name": name,
+                "is_cruelty_free": bool(is_cf),
+                "confidence": confidence,
+                "sources": sources.split(",") if sources else [],
+                "origin": origin,
+                "verified_at": verified_at,
+                "status_changed": previous is not None and bool(previous) != bool(is_cf)
+            }
+            for entry_id, name, is_cf, confidence, sources, origin, verified_at, previous in rows
+        ]
+    
+    def get_changes_since(self, since: str, after_id: int = 0, limit: int = 1000) -> dict:
+        """Log entries after (since, after_id) in commit order, for incremental replica sync"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, brand_name, is_cruelty_free, confidence, sources, sources_count, origin, verified_at
+            FROM verifications
+            WHERE verified_at > ? OR (verified_at = ? AND id > ?)
+            ORDER BY verified_at, id
+            LIMIT ?
+        """, (since, since, after_id, limit))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        changes = [
+            {
+                "id": entry_id,
+                "brand_name": name,
+                "is_cruelty_free": bool(is_cf),
+                "confidence": confidence,
+                "sources": sources.split(",") if sources else [],
+                "sources_count": sources_count,
+                "origin": origin,
+                "verified_at": verified_at
+            }
+            for entry_id, name, is_cf, confidence, sources, sources_count, origin, verified_at in rows
+        ]
+        # Resume from here on the next call
+        cursor_position = {"since": changes[-1]["verified_at"], "after_id": changes[-1]["id"]} if changes \
+            else {"since": since, "after_id": after_id}
+        return {"changes": changes, "next": cursor_position, "has_more": len(changes) == limit}
+    
+    def _pending_brand_result(self, brand_name: str):
+        """check_database result for a save not yet committed, or None"""
+        pending = self.writer.get_pending(brand_name.lower()) if self.writer else None
+        if not pending:
+            return None
+        return {
+            "found": True,
+            "brand_name": pending["name"],
+            "is_cruelty_free": bool(pending["is_cruelty_free"]),
+            "parent_company": pending["parent_company"],
+            "explanation": pending["explanation"],
+            "sources": pending["sources"].split(",") if pending["sources"] else [],
+            "last_verified": pending["queued_at"],
+            "confidence": pending["confidence"],
+            "sources_count": pending["sources_count"],
+            "expires_at": None,
+            "is_stale": False
+        }
+    
+    def _brand_row_result(self, row: tuple) -> dict:
+        """check_database result for a row selected with BRAND_COLUMNS"""
+        (name, is_cf, parent, explanation, sources, last_verified,
+         confidence, sources_count, expires_at, is_stale) = row
+        
+        return {
+            "found": True,
+            "brand_name": name,
+            "is_cruelty_free": bool(is_cf),
+            "parent_company": parent,
+            "explanation": explanation,
+            "sources": sources.split(",") if sources else [],
+            "last_verified": last_verified,
+            "confidence": confidence,
+            "sources_count": sources_count,
+            "expires_at": expires_at,
+            "is_stale": bool(is_stale)
+        }
+    
     def _check_database(self, brand_name: str) -> dict:
         """Tool: Check database"""
+        # Read-your-writes: a save still waiting in the write-behind queue wins
+        pending = self._pending_brand_result(brand_name)
+        if pending:
+            return pending
+        
+        with tracing.span("db.check_database"):
+            return self._lookup_brands([brand_name])[brand_name]
+    
+    def _check_database_batch(self, brand_names: list) -> dict:
+        """check_database for several brands with a single query"""
+        results = {}
+        remaining = []
+        for name in brand_names:
+            result = self._pending_brand_result(name)
+            if result:
+                results[name] = result
+            else:
+                remaining.append(name)
+        
+        if remaining:
+            with tracing.span("db.check_database_batch", brands=len(remaining)):
+                results.update(self._lookup_brands(remaining))
+        return results
+    
+    def _select_brand_rows(self, names: list) -> dict:
+        """Brand rows by lowercased name, one query"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT {BRAND_COLUMNS}
+                FROM brands
+                WHERE LOWER(name) IN ({",".join("?" * len(names))})
+            """, [name.lower() for name in names])
+            return {row[0].lower(): row for row in cursor.fetchall()}
+        finally:
+            conn.close()
+    
+    def _lookup_brands(self, names: list) -> dict:
+        """check_database results, SQLite first; the snapshot resolves aliases and serves brands SQLite lacks.
+        
+        The snapshot is a point-in-time export, so its record may predate the
+        latest save, import or rescore; a row in SQLite always wins.
+        """
+        try:
+            rows = self._select_brand_rows(names)
+        except sqlite3.Error as e:
+            if not self.snapshot:
+                raise
+            print(f"[Database] SQLite unavailable, answering from snapshot: {e}")
+            return {name: self.snapshot.check_database(name) for name in names}
+        
+        # "elf" -> "e.l.f. Cosmetics": aliases the exact-name query can't match
+        snapshot_hits = {}
+        if self.snapshot:
+            for name in names:
+                if name.lower() not in rows:
+                    hit = self.snapshot.check_database(name)
+                    if hit["found"]:
+                        snapshot_hits[name] = hit
+            missing = [hit["brand_name"] for hit in snapshot_hits.values() if hit["brand_name"].lower() not in rows]
+            if missing:
+                rows.update(self._select_brand_rows(missing))
+        
+        results = {}
+        for name in names:
+            hit = snapshot_hits.get(name)
+            row = rows.get(name.lower()) or (rows.get(hit["brand_name"].lower()) if hit else None)
+            # Not in SQLite (freshly seeded replica): the snapshot's record beats a web search
+            results[name] = self._brand_row_result(row) if row else hit or {"found": False}
+        return results
+    
+    def _search_database(self, query: str = "", cruelty_free: bool = None, limit: int = 10,
+                         certifier: str = None) -> dict:
+        """Tool: Ranked full-text search over verified brands, optionally by certifier"""
+        terms = re.findall(r"\w+", query or "")
+        if not terms and not certifier:
+            return {"results": [], "count": 0}
+        limit = max(1, min(int(limit or 10), 50))
+        
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
-        cursor.execute("""
-            SELECT name, is_cruelty_free, parent_company, explanation, 
-                   sources, last_verified
-            FROM brands 
-            WHERE LOWER(name) = LOWER(?)
-        """, (brand_name,))
+        columns = "b.name, b.is_cruelty_free, b.parent_company, b.explanation, b.sources, b.confidence"
+        filters = ""
+        params = []
+        if not terms:
+            # Certifier only: straight off the (certifier, status, brand_id) index
+            sql = f"""
+                SELECT {columns}
+                FROM certifications c
+                JOIN brands b ON b.id = c.brand_id
+                WHERE c.certifier = ? AND c.status = 'certified'{{filters}}
+                ORDER BY b.name
+                LIMIT ?
+            """
+            params.append(certifications.canonical_certifier(certifier))
+            certifier = None
+        elif self.fts_enabled:
+            # Quote each term so user text can't inject FTS syntax; prefix-match the last one
+            match = " ".join(f'"{term}"' for term in terms) + "*"
+            sql = f"""
+                SELECT {columns}
+                FROM brands_fts
+                JOIN brands b ON b.id = brands_fts.rowid
+                WHERE brands_fts MATCH ?{{filters}}
+                ORDER BY bm25(brands_fts, 10.0, 5.0, 1.0, 3.0)
+                LIMIT ?
+            """
+            params.append(match)
+        else:
+            sql = f"""
+                SELECT {columns}
+                FROM brands b
+                WHERE {{term_filter}}{{filters}}
+                ORDER BY name
+                LIMIT ?
+            """.replace("{term_filter}", " AND ".join(
+                "(b.name || ' ' || IFNULL(b.parent_company, '') || ' ' || IFNULL(b.explanation, '')"
+                " || ' ' || IFNULL(b.sources, '')) LIKE ?" for _ in terms
+            ))
+            params.extend(f"%{term}%" for term in terms)
         
-        result = cursor.fetchone()
+        if cruelty_free is not None:
+            filters += " AND b.is_cruelty_free = ?"
+            params.append(cruelty_free)
+        if certifier:
+            filters += """ AND b.id IN (
+                SELECT brand_id FROM certifications WHERE certifier = ? AND status = 'certified'
+            )"""
+            params.append(certifications.canonical_certifier(certifier))
+        params.append(limit)
+        
+        cursor.execute(sql.replace("{filters}", filters), params)
+        rows = cursor.fetchall()
         conn.close()
         
-        if result:
-            name, is_cf, parent, explanation, sources, last_verified = result
-            
-            last_verified_date = datetime.strptime(last_verified, "%Y-%m-%d %H:%M:%S")
-            is_stale = datetime.now() - last_verified_date > timedelta(days=30)
-            
-            return {
-                "found": True,
+        results = [
+            {
                 "brand_name": name,
                 "is_cruelty_free": bool(is_cf),
                 "parent_company": parent,
                 "explanation": explanation,
                 "sources": sources.split(",") if sources else [],
-                "last_verified": last_verified,
-                "is_stale": is_stale
+                "confidence": confidence
+            }
+            for name, is_cf, parent, explanation, sources, confidence in rows
+        ]
+        return {"results": results, "count": len(results)}
+    
+    def _normalize_category(self, category: str) -> str:
+        """Catalog category key ("Mascaras" -> "mascara")"""
+        category = category.strip().lower()
+        if category.endswith("s") and not category.endswith("ss"):
+            category = category[:-1]
+        return category
+    
+    def _find_alternatives(self, category: str, max_price: float = None, limit: int = 5) -> dict:
+        """Tool: Cruelty-free products in a category, filtered and ranked by the user profile"""
+        result = self._query_alternatives(self._normalize_category(category), max_price, limit)
+        self._remember_alternatives(result)
+        return result
+    
+    def _remember_alternatives(self, result: dict):
+        """Track the category and top pick so feedback like "too expensive" has context"""
+        self.last_product_type = result["category"]
+        if result["alternatives"]:
+            self.last_alternatives = result["alternatives"]
+            top = result["alternatives"][0]
+            self.last_recommendation = {"price": top["price"], "brand": top["brand"]}
+    
+    def _query_alternatives(self, category: str, max_price: float = None, limit: int = 5) -> dict:
+        """Run the catalog query for a normalized category without touching session state"""
+        profile = self.user_profile
+        limit = max(1, min(int(limit or 5), 20))
+        
+        caps = [cap for cap in (max_price, profile.budget_max) if cap]
+        budget = min(caps) if caps else None
+        
+        conditions = ["p.category = ?", "b.is_cruelty_free = 1"]
+        params = [category]
+        if budget:
+            conditions.append("p.price <= ?")
+            params.append(budget)
+        for value, column in (("vegan", "is_vegan"), ("fragrance_free", "is_fragrance_free"),
+                              ("paraben_free", "is_paraben_free")):
+            if profile.values[value]:
+                conditions.append(f"p.{column} = 1")
+        if profile.rejected_brands:
+            conditions.append(f"p.brand NOT IN ({','.join('?' * len(profile.rejected_brands))})")
+            params.extend(profile.rejected_brands)
+        
+        # Brands the user already likes first, then cheapest
+        preferred = list(profile.preferred_brands) or [""]
+        params.extend(preferred)
+        params.append(limit)
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT p.brand, p.name, p.price, p.is_vegan, p.is_fragrance_free, p.is_paraben_free
+            FROM products p
+            JOIN brands b ON b.name = p.brand
+            WHERE {" AND ".join(conditions)}
+            ORDER BY p.brand IN ({','.join('?' * len(preferred))}) DESC, p.price
+            LIMIT ?
+        """, params)
+        rows = cursor.fetchall()
+        conn.close()
+        
+        alternatives = [
+            {
+                "brand": brand,
+                "product": name,
+                "price": price,
+                "vegan": bool(vegan),
+                "fragrance_free": bool(fragrance_free),
+                "paraben_free": bool(paraben_free)
             }
+            for brand, name, price, vegan, fragrance_free, paraben_free in rows
+        ]
         
-        return {"found": False}
-    
-    def _extract_sources_count(self, search_result: str) -> int:
-        """Extract number of sources from search result"""
-        match = re.search(r'SOURCES CHECKED:\s*(\d+)', search_result)
-        if match:
-            return int(match.group(1))
-        # Fallback: count mentions of known sources
-        sources = ['PETA', 'Leaping Bunny', 'Cruelty-Free', 'Logical Harmony']
-        return sum(1 for source in sources if source in search_result)
-    
-    def _detect_conflicts(self, search_result: str) -> bool:
-        """Detect if sources conflict"""
-        # Simple heuristic
-        has_positive = any(word in search_result.lower() for word in ['cruelty-free', 'certified', 'approved'])
-        has_negative = any(word in search_result.lower() for word in ['not cruelty-free', 'tests on animals', 'not certified'])
-        return has_positive and has_negative
-    
-    def _web_search(self, query: str) -> str:
-        """Tool: REAL web search with fallback"""
+        return {
+            "category": category,
+            "constraints_applied": self.user_profile.get_constraints_for_agent(),
+            "budget_max": budget,
+            "alternatives": alternatives,
+            "count": len(alternatives)
+        }
+    
+    def _web_search(self, query: str) -> dict:
+        """Tool: REAL web search with fallback, returning structured per-source findings"""
         try:
             print(f"[Web Search] Searching for: {query}")
             
-            search_response = self.client.messages.create(
-                model=self.model,
-                max_tokens=2000,
-                temperature=0.3,
-                system="""You are a research assistant specializing in cruelty-free beauty products. 
-
-When searching, look for:
-1. Brand's cruelty-free status (PETA, Leaping Bunny certification)
-2. Parent company information
-3. China market presence (mandatory animal testing)
-4. Alternative product recommendations with prices
-5. Multiple authoritative sources
-
-Format your response as:
-SOURCES CHECKED: [number]
-
-[Source 1 name]: [key findings]
-[Source 2 name]: [key findings]
-...
-
-CONFIDENCE: [High/Medium/Low based on source agreement]""",
-                messages=[{
-                    "role": "user",
-                    "content": f"Search for information about: {query}\n\nFocus on cruelty-free certifications, parent companies, and reliable sources like PETA and Leaping Bunny."
-                }],
-                tools=[{
-                    "name": "web_search",
-                    "description": "Search the web for current information",
-                    "input_schema": {
-                        "type": "object",
-                        "properties": {
-                            "query": {
-                                "type": "string",
-                                "description": "The search query"
-                            }
-                        },
-                        "required": ["query"]
-                    }
-                }]
-            )
+            if self.current_budget and self.current_budget.check_llm():
+                print(f"[Web Search] Budget exhausted ({self.current_budget.exhausted_by}), skipping live search")
+                # Nothing was searched: no mock data, nothing to score or show
+                return {"summary": "", "findings": [], "skipped": self.current_budget.exhausted_by}
             
-            result_text = ""
-            for block in search_response.content:
-                if hasattr(block, 'text'):
-                    result_text += block.text
+            try:
+                search_response = self._call_llm(**search_request(self.model, query))
+            except TimeoutError:
+                if not self.current_budget:
+                    raise
+                self.current_budget.exhausted_by = "deadline"
+                print("[Web Search] Deadline passed waiting for the LLM, skipping live search")
+                return {"summary": "", "findings": [], "skipped": "deadline"}
             
-            print(f"[Web Search] Got {len(result_text)} characters of results")
-            return result_text if result_text else self._mock_search_fallback(query)
+            result = findings_from_content(search_response.content)
+            if result:
+                print(f"[Web Search] Got {len(result['findings'])} source findings")
+                return result
+            return self._fallback_findings(query)
             
         except Exception as e:
             print(f"[Web Search Error] {str(e)}")
-            return self._mock_search_fallback(query)
+            return self._fallback_findings(query)
+    
+    def _fallback_findings(self, query: str) -> dict:
+        """Mock search data in the same structured shape as a live search"""
+        with tracing.span("web_search.fallback"):
+            text = self._mock_search_fallback(query)
+            return {"summary": text, "findings": parse_findings(text), "fallback": True}
+    
+    def _call_llm(self, **kwargs):
+        """Send a messages.create call through the priority scheduler, charging it to the current query budget"""
+        budget = self.current_budget
+        if budget:
+            kwargs["max_tokens"] = max(256, min(kwargs["max_tokens"], budget.remaining_tokens()))
+        
+        with tracing.span("llm.call", model=kwargs.get("model"), priority=scheduler.current_priority(),
+                          forced_tool=kwargs.get("tool_choice", {}).get("name")) as llm_span:
+            # Queueing counts against the deadline: TimeoutError once it passes without a slot
+            with self.scheduler.slot(timeout=budget.remaining_seconds() if budget else None) as queue_ms:
+                llm_span.set(queue_ms=round(queue_ms, 2))
+                client = self.client
+                if budget:
+                    kwargs.setdefault("timeout", max(budget.remaining_seconds(), 1.0))
+                    # A retry would restart the timeout and overrun the deadline
+                    client = client.with_options(max_retries=0)
+                try:
+                    response = client.messages.create(**kwargs)
+                except APITimeoutError as e:
+                    if not budget:
+                        raise
+                    raise TimeoutError(f"LLM call ran past the query deadline: {e}") from e
+            usage = getattr(response, "usage", None)
+            llm_span.set(
+                stop_reason=response.stop_reason,
+                input_tokens=getattr(usage, "input_tokens", None),
+                output_tokens=getattr(usage, "output_tokens", None)
+            )
+        
+        if budget:
+            budget.record_llm_call(response)
+        return response
+    
+    def _best_effort_answer(self, messages: list, gathered: list, reason: str) -> str:
+        """Build an answer from whatever was gathered before a budget ran out"""
+        parts = []
+        
+        # Anything the model already told the user
+        for message in reversed(messages):
+            if message["role"] == "assistant":
+                text = " ".join(
+                    block.text for block in message["content"] if hasattr(block, "text")
+                ).strip()
+                if text:
+                    parts.append(text)
+                break
+        
+        findings = []
+        for tool_name, tool_result in gathered:
+            line = None
+            if tool_name == "check_database" and tool_result.get("found"):
+                status = "cruelty-free" if tool_result["is_cruelty_free"] else "NOT cruelty-free"
+                line = f"- **{tool_result['brand_name']}** is {status}: {tool_result['explanation']}"
+            elif tool_name == "web_search" and tool_result and not tool_result.get("skipped"):
+                line = f"- Search notes: {tool_result['summary'][:500]}"
+            if line and line not in findings:
+                findings.append(line)
+        
+        if findings:
+            parts.append("I hit my research limit before finishing, so here's what I found so far:\n\n" + "\n".join(findings))
+        else:
+            parts.append("I couldn't finish researching this in time. Please try again, or ask about a specific brand.")
+        
+        print(f"[Budget] Exhausted ({reason}), returning best-effort answer")
+        return "\n\n".join(parts)
     
     def _mock_search_fallback(self, query: str) -> str:
         """Enhanced fallback with realistic multi-source data"""
@@ -452,29 +1582,85 @@ CONFIDENCE: Medium (using cached knowledge)"""
     
     def _save_to_database(self, brand_name: str, is_cruelty_free: bool,
                          parent_company: str = None, explanation: str = "",
-                         sources: list = None) -> dict:
+                         sources: list = None, confidence: float = None,
+                         sources_count: int = None, has_conflicts: bool = False,
+                         origin: str = "agent", findings: list = None) -> dict:
         """Tool: Save to database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        record = brand_record(brand_name, is_cruelty_free, parent_company, explanation, sources,
+                              confidence, sources_count, has_conflicts, origin, findings)
+        ttl_days = record["ttl_days"]
+        
+        if self.prefetcher:
+            self.prefetcher.invalidate(("check_database", normalize_brand_name(brand_name)))
+        if self.negative_cache:
+            self.negative_cache.discard(brand_name)
+        if self.brand_extractor:
+            self.brand_extractor.add(brand_name)
+        if self.response_cache:
+            self.response_cache.invalidate_brand(brand_name)
         
-        sources_str = ",".join(sources) if sources else ""
+        # Acknowledge immediately; the background writer commits with the next batch
+        if self.writer:
+            self.writer.submit(brand_name.lower(), record)
+            return {"success": True, "message": f"Saved {brand_name}", "fresh_for_days": ttl_days, "queued": True}
         
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        cursor = conn.cursor()
         try:
-            cursor.execute("""
-                INSERT OR REPLACE INTO brands 
-                (name, is_cruelty_free, parent_company, explanation, sources, last_verified)
-                VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-            """, (brand_name, is_cruelty_free, parent_company, explanation, sources_str))
-            
+            write_brand_records(cursor, [record])
             conn.commit()
             conn.close()
             
-            return {"success": True, "message": f"Saved {brand_name}"}
+            return {"success": True, "message": f"Saved {brand_name}", "fresh_for_days": ttl_days}
         except Exception as e:
             conn.close()
             return {"success": False, "error": str(e)}
     
+    def _prefetched_result(self, tool_name: str, tool_input: dict):
+        """Result warmed by the prefetcher for this tool call, or None"""
+        if not self.prefetcher:
+            return None
+        if tool_name == "check_database":
+            return self.prefetcher.get(("check_database", normalize_brand_name(tool_input["brand_name"])))
+        if tool_name == "find_alternatives" and not tool_input.get("max_price") and tool_input.get("limit", 5) == 5:
+            result = self.prefetcher.get((
+                "find_alternatives",
+                self._normalize_category(tool_input["category"]),
+                self.user_profile.get_constraints_for_agent()
+            ))
+            if result:
+                self._remember_alternatives(result)
+            return result
+        if tool_name == "web_search":
+            return self.prefetcher.match_web_search(tool_input["query"])
+        return None
+    
     def _execute_tool(self, tool_name: str, tool_input: dict) -> any:
+        """Execute a tool inside its own trace span"""
+        with tracing.span(f"tool.{tool_name}", input=json.dumps(tool_input)[:200]) as tool_span, \
+                profiling.label(f"tool.{tool_name}"):
+            result = self._run_tool(tool_name, tool_input)
+            tool_span.set(cache=self.tool_calls[-1].get("cache"))
+        self._remember_tool_result(tool_name, tool_input, result)
+        return result
+    
+    def _remember_tool_result(self, tool_name: str, tool_input: dict, result: dict):
+        """Keep what a tool established in session memory for later turns"""
+        if tool_name == "check_database" and result.get("found"):
+            self.memory.remember_brand(result)
+        elif tool_name == "web_search" and self.last_brand_discussed and not result.get("skipped"):
+            self.memory.remember_search(self.last_brand_discussed, tool_input["query"], result)
+        elif tool_name == "find_alternatives":
+            self.memory.remember_alternatives(result)
+        elif tool_name == "save_to_database" and result.get("success"):
+            self.memory.remember_brand({
+                "brand_name": tool_input["brand_name"],
+                "is_cruelty_free": tool_input["is_cruelty_free"],
+                "parent_company": tool_input.get("parent_company"),
+                "sources": tool_input.get("sources", [])
+            })
+    
+    def _run_tool(self, tool_name: str, tool_input: dict) -> any:
         """Execute a tool"""
         self.tool_calls.append({
             "tool": tool_name,
@@ -482,56 +1668,346 @@ CONFIDENCE: Medium (using cached knowledge)"""
             "timestamp": datetime.now().isoformat()
         })
         
+        prefetched = self._prefetched_result(tool_name, tool_input)
+        if prefetched is not None:
+            self.tool_calls[-1]["cache"] = "prefetch"
+            if tool_name != "web_search":
+                return prefetched
+        
         if tool_name == "check_database":
-            return self._check_database(tool_input["brand_name"])
+            result = self._check_database(tool_input["brand_name"])
+            self._local.unresolved_brand = None if result["found"] else tool_input["brand_name"]
+            if not result["found"] and self.negative_cache:
+                cached = self.negative_cache.get(tool_input["brand_name"])
+                if cached:
+                    self.tool_calls[-1]["cache"] = "negative"
+                    return {
+                        "found": False,
+                        "recently_searched": True,
+                        **cached,
+                        "note": "A recent web search found no reliable information about this brand. "
+                                "Do not search again; tell the user and ask them to check the spelling."
+                    }
+            return result
+        elif tool_name == "search_database":
+            return self._search_database(
+                tool_input.get("query", ""),
+                tool_input.get("cruelty_free"),
+                tool_input.get("limit", 10),
+                tool_input.get("certifier")
+            )
+        elif tool_name == "find_alternatives":
+            return self._find_alternatives(
+                tool_input["category"],
+                tool_input.get("max_price"),
+                tool_input.get("limit", 5)
+            )
         elif tool_name == "web_search":
-            result = self._web_search(tool_input["query"])
+            result = prefetched or self._web_search(tool_input["query"])
             
-            # Extract confidence metrics from search result
-            sources_count = self._extract_sources_count(result)
-            has_conflicts = self._detect_conflicts(result)
+            # Score the structured findings (verdict comes from the sources, not assumed)
+            verification = VerificationResult.from_findings(
+                self.last_brand_discussed or tool_input["query"], result["findings"]
+            )
+            if self.last_brand_discussed and not result.get("skipped"):
+                self.last_verification_result = verification
             
-            # Store for later use
-            if self.last_brand_discussed:
-                self.last_verification_result = VerificationResult(
-                    brand=self.last_brand_discussed,
-                    is_cruelty_free=True,  # Will be updated by agent's final answer
-                    sources_count=sources_count,
-                    has_conflicts=has_conflicts
-                )
+            result["assessment"] = {
+                "is_cruelty_free": verification.is_cruelty_free,
+                "confidence": verification.confidence,
+                "confidence_label": verification.get_confidence_label(),
+                "sources_count": verification.sources_count,
+                "has_conflicts": verification.has_conflicts
+            }
             
+            # A live search that settles nothing about an unknown brand is worth remembering
+            unresolved = getattr(self._local, "unresolved_brand", None)
+            if (self.negative_cache and unresolved and verification.is_cruelty_free is None
+                    and not result.get("fallback") and not result.get("skipped")
+                    and normalize_brand_name(unresolved) in normalize_brand_name(tool_input["query"])):
+                self.negative_cache.put(unresolved, tool_input["query"], "no reliable sources found")
             return result
         elif tool_name == "save_to_database":
+            # Carry over the confidence of the search that verified this brand
+            verification = self.last_verification_result
+            if not (verification and verification.brand.lower() == tool_input["brand_name"].lower()
+                    and verification.is_cruelty_free == tool_input["is_cruelty_free"]):
+                verification = None
+            
             return self._save_to_database(
                 tool_input["brand_name"],
                 tool_input["is_cruelty_free"],
                 tool_input.get("parent_company"),
                 tool_input.get("explanation", ""),
-                tool_input.get("sources", [])
+                tool_input.get("sources", []),
+                confidence=verification.confidence if verification else None,
+                sources_count=verification.sources_count if verification else None,
+                has_conflicts=verification.has_conflicts if verification else False,
+                findings=verification.findings if verification else None
             )
         
         return {"error": f"Unknown tool: {tool_name}"}
     
-    def _detect_feedback(self, user_query: str) -> bool:
-        """Detect if user is giving feedback or expressing preferences"""
-        feedback_words = ["expensive", "cheap", "too much", "perfect", "good", "bad", 
-                         "affordable", "pricey", "budget", "love", "hate",
-                         "vegan", "fragrance", "paraben", "scent"]
-        return any(word in user_query.lower() for word in feedback_words)
+    def _detect_feedback(self, user_query: str):
+        """Classify feedback or preferences in the turn (FEEDBACK_INTENTS); None if there are none"""
+        feedback = self.feedback_classifier.classify(user_query)
+        return feedback if feedback.intents else None
+    
+    def process_query(self, user_query: str, budget: QueryBudget = None, profile: bool = None) -> tuple:
+        """Main agentic loop with confidence scoring (profile=True/False overrides profile sampling)"""
+        started = time.perf_counter()
+        cache_before = self._cache_stats()
+        budget = budget or QueryBudget(**self.budget_limits)
+        
+        with self.profiler.profile("process_query", force=profile) as profile_session:
+            with self.tracer.trace("query", query=user_query[:200]) as trace:
+                result = self._process_query(user_query, budget)
+                if trace:
+                    trace.root.set(llm_calls=budget.llm_calls, tool_calls=len(self.tool_calls),
+                                   tokens=budget.tokens_used, budget_hit=budget.exhausted_by)
+            if profile_session and trace:
+                profile_session.request_id = trace.trace_id
+        self.last_trace = trace.to_dict() if trace else None
+        self.last_profile = profile_session.summary() if profile_session else None
+        
+        if self.telemetry_writer:
+            self._record_telemetry(user_query, budget, started, cache_before)
+        return result
     
-    def process_query(self, user_query: str) -> tuple:
-        """Main agentic loop with confidence scoring"""
+    def _cache_stats(self) -> dict:
+        """Cumulative hits, misses and current size of each in-process cache"""
+        stats = {}
+        if self.prefetcher:
+            stats["prefetch"] = {
+                "hits": self.prefetcher.stats["hits"],
+                "misses": self.prefetcher.stats["misses"],
+                "size": len(self.prefetcher._cache)
+            }
+        if self.negative_cache:
+            stats["negative"] = {
+                "hits": self.negative_cache.stats["hits"],
+                "misses": self.negative_cache.stats["misses"],
+                "size": self.negative_cache.size()
+            }
+        if self.response_cache:
+            stats["response"] = {
+                "hits": self.response_cache.stats["hits"],
+                "misses": self.response_cache.stats["misses"],
+                "size": self.response_cache.size()
+            }
+        return stats
+    
+    def _record_telemetry(self, user_query: str, budget: QueryBudget, started: float, cache_before: dict):
+        """Queue one query_log row: latency, token spend and this query's cache hits/misses"""
+        cache_delta = {}
+        for name, after in self._cache_stats().items():
+            before = cache_before.get(name, {})
+            cache_delta[name] = {
+                "hits": after["hits"] - before.get("hits", 0),
+                "misses": after["misses"] - before.get("misses", 0),
+                "size": after["size"]
+            }
+        
+        handled_by = "llm" if budget.llm_calls else "local"
+        brands = sorted({
+            call["input"]["brand_name"] for call in self.tool_calls
+            if call["tool"] == "check_database"
+        })
+        
+        self.telemetry_writer.submit(f"query-{id(budget)}-{started}", {
+            "query": user_query[:200],
+            "brands": brands,
+            "handled_by": handled_by,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            "llm_calls": budget.llm_calls,
+            "tool_calls": len(self.tool_calls),
+            "input_tokens": budget.input_tokens,
+            "output_tokens": budget.output_tokens,
+            "budget_hit": budget.exhausted_by,
+            "cache_stats": cache_delta
+        })
+    
+    def reverify_brand(self, brand_name: str, origin: str = "refresh", priority: str = "background") -> dict:
+        """Search a brand again and save the verdict if the sources settle it"""
+        with scheduler.priority(priority):
+            result = self._web_search(REVERIFY_QUERY.format(brand=brand_name))
+        verification = VerificationResult.from_findings(brand_name, result["findings"])
+        if verification.is_cruelty_free is None:
+            return {"success": False, "brand_name": brand_name, "error": "No conclusive sources"}
+        
+        existing = self._check_database(brand_name)
+        return self._save_to_database(
+            existing.get("brand_name", brand_name),
+            verification.is_cruelty_free,
+            existing.get("parent_company"),
+            result["summary"][:500],
+            list(dict.fromkeys(finding["source"] for finding in verification.findings)),
+            confidence=verification.confidence,
+            sources_count=verification.sources_count,
+            has_conflicts=verification.has_conflicts,
+            origin=origin,
+            findings=verification.findings
+        )
+    
+    def _process_query(self, user_query: str, budget: QueryBudget) -> tuple:
+        """Answer one turn: locally for pure feedback, otherwise through the agent loop"""
         self.tool_calls = []
         
+        # A new topic makes the previous turn's prefetch useless
+        if self.prefetcher and not self.prefetcher.is_follow_up(user_query):
+            self.prefetcher.cancel()
+        
         # Check for feedback
-        if self._detect_feedback(user_query):
+        feedback = self._detect_feedback(user_query)
+        if feedback:
             if self.last_recommendation:
                 self.user_profile.learn_from_feedback(
                     user_query,
-                    {"last_price": self.last_recommendation.get("price")}
+                    {"last_price": self.last_recommendation.get("price")},
+                    feedback.negated
                 )
             else:
-                self.user_profile.learn_from_feedback(user_query, {})
+                self.user_profile.learn_from_feedback(user_query, {}, feedback.negated)
+            
+            # Pure preference updates don't need the LLM
+            if feedback.is_pure_feedback(self.feedback_classifier.threshold):
+                return self._handle_feedback_locally(feedback)
+        
+        # Asking again about a brand that was just searched without result skips the LLM
+        unresolved = self._negative_cache_answer(user_query)
+        if unresolved:
+            return unresolved
+        
+        # Same question, same constraints, unchanged brand rows: same answer
+        key = None
+        if self.response_cache:
+            key = response_cache.cache_key(user_query, self.user_profile.get_constraints_for_agent())
+            cached = self.response_cache.get(key)
+            if cached:
+                return self._cached_response(cached)
+        
+        self._local.unresolved_brand = None
+        self._local.stop_reason = None
+        self.current_budget = budget
+        try:
+            result = self._run_agent_loop(user_query)
+        finally:
+            self.current_budget = None
+        
+        # Only a model answer is repeatable; not an error, a truncation or a budget cut-off
+        if key and self._local.stop_reason == "end_turn":
+            self._remember_response(key, user_query, result[0])
+        
+        # Warm the usual follow-ups (parent, vegan, alternatives) while the user reads
+        checked_brand = any(call["tool"] == "check_database" for call in self.tool_calls)
+        if self.prefetcher and checked_brand and self.prefetcher.topic_brand != self.last_brand_discussed:
+            self.prefetcher.schedule(self.last_brand_discussed, self.last_product_type)
+        return result
+    
+    def _cached_response(self, cached: dict) -> tuple:
+        """Replay a memoized answer and the research steps it came from"""
+        self.tool_calls.append({
+            "tool": "response_cache",
+            "input": {"brands": sorted(cached["versions"]), "confidence": cached["confidence"]},
+            "timestamp": datetime.now().isoformat()
+        })
+        self.tool_calls.extend(dict(call, cache="response") for call in cached["tool_calls"])
+        self.last_brand_discussed = cached["last_brand"] or self.last_brand_discussed
+        return cached["response"], self.tool_calls
+    
+    def _remember_response(self, key: tuple, user_query: str, response: str):
+        """Memoize an answer that depends only on the question and fresh rows of brands it names"""
+        if not self.brand_extractor or not self.tool_calls:
+            return
+        if any(call["tool"] != "check_database" for call in self.tool_calls):
+            return  # searches, saves, alternatives and budget cut-offs aren't repeatable
+        
+        checked = {call["input"]["brand_name"] for call in self.tool_calls}
+        mentioned = {normalize_brand_name(name) for name in self.brand_extractor.extract(user_query)}
+        if not {normalize_brand_name(name) for name in checked} <= mentioned:
+            return  # answer leaned on conversation context ("is it vegan?")
+        
+        results = self._check_database_batch(sorted(checked))
+        if not all(result["found"] and not result["is_stale"] for result in results.values()):
+            return
+        
+        self.response_cache.put(
+            key,
+            [result["brand_name"] for result in results.values()],
+            response,
+            [dict(call) for call in self.tool_calls],
+            confidence=min(result["confidence"] or 0 for result in results.values()),
+            last_brand=self.last_brand_discussed
+        )
+    
+    def _negative_cache_answer(self, user_query: str):
+        """Answer a status question about a recently unresolvable brand, or None"""
+        if not self.negative_cache:
+            return None
+        brand = brand_from_question(user_query)
+        cached = self.negative_cache.get(brand) if brand else None
+        # Someone may have verified it since (another session, CSV import)
+        if not cached or self._check_database(brand)["found"]:
+            return None
+        
+        self.tool_calls.append({
+            "tool": "negative_cache",
+            "input": {"brand_name": brand, "searched_seconds_ago": cached["searched_seconds_ago"]},
+            "timestamp": datetime.now().isoformat()
+        })
+        self.last_brand_discussed = brand
+        
+        minutes = round(cached["searched_seconds_ago"] / 60)
+        when = "just now" if minutes < 1 else f"{minutes} minute{'s' if minutes != 1 else ''} ago"
+        return (f"I couldn't find reliable information about **{brand}** — I searched for it "
+                f"{when} and no certifier or trusted source covers it. "
+                "Could you double-check the spelling? If it's a small or new brand, look for the "
+                "Leaping Bunny logo or ask the brand whether they or their suppliers test on animals."), self.tool_calls
+    
+    def _handle_feedback_locally(self, feedback) -> tuple:
+        """Acknowledge a preference update and re-rank the last recommendations from the catalog"""
+        self.tool_calls.append({
+            "tool": "local_feedback",
+            "input": {"intents": sorted(feedback.intents), "confidence": round(feedback.confidence, 2)},
+            "timestamp": datetime.now().isoformat()
+        })
+        
+        if "negative" in feedback.intents and self.last_recommendation and self.last_recommendation.get("brand"):
+            self.user_profile.rejected_brands.add(self.last_recommendation["brand"])
+        
+        constraints = self.user_profile.get_constraints_for_agent()
+        preference_update = feedback.intents - {"positive", "negative"}
+        
+        if feedback.intents <= {"positive"}:
+            return "So glad that works for you! 💚 Want me to check another product or brand?", self.tool_calls
+        
+        if "budget_down" in feedback.intents and not self.user_profile.budget_max:
+            return ("Got it, I'll look for something more affordable. What's your budget? "
+                    "Tell me a price and a product type and I'll find cruelty-free options."), self.tool_calls
+        
+        opening = f"Got it! From now on I'll stick to **{constraints}** options." if preference_update \
+            else "No problem, let's find you something else."
+        
+        if not self.last_product_type:
+            return f"{opening} What product are you looking for?", self.tool_calls
+        
+        result = self._execute_tool("find_alternatives", {"category": self.last_product_type})
+        if not result["alternatives"]:
+            return (f"{opening} I don't have a {self.last_product_type} in my catalog that matches all of that yet. "
+                    "Want me to search the web for one?"), self.tool_calls
+        
+        lines = []
+        for alt in result["alternatives"]:
+            tags = [label for key, label in (("vegan", "vegan"), ("fragrance_free", "fragrance-free"),
+                                             ("paraben_free", "paraben-free")) if alt[key]]
+            tag_text = f" ({', '.join(tags)})" if tags else ""
+            lines.append(f"- **{alt['brand']} {alt['product']}** — ${alt['price']:.0f}{tag_text}")
+        
+        return (f"{opening} Here are {self.last_product_type} picks that fit:\n\n" + "\n".join(lines)), self.tool_calls
+    
+    def _run_agent_loop(self, user_query: str) -> tuple:
+        """Run the tool-use loop until the model answers or a budget runs out; the last stop_reason is left in _local"""
+        budget = self.current_budget
         
         # Get context
         profile_summary = self.user_profile.get_profile_summary()
@@ -543,17 +2019,31 @@ CONFIDENCE: Medium (using cached knowledge)"""
             if self.last_product_type:
                 context_info += f"\n- Product type: {self.last_product_type}"
         
+        # What earlier turns established, so follow-ups don't repeat the research
+        if self.memory:
+            context_info += "\n\n" + self.memory.render()
+        
+        # Known brands named in the query are looked up now instead of in a check_database round trip
+        gathered = self._lookup_mentioned_brands(user_query)
+        if gathered:
+            context_info += (
+                "\n\nDATABASE RESULTS FOR BRANDS IN THIS MESSAGE (check_database was already run for these; "
+                "do not call it again for them, use web_search only if a result is_stale):\n"
+                + json.dumps({result["brand_name"]: result for _, result in gathered})
+            )
+        
         system_prompt = f"""You are an intelligent agent helping users find cruelty-free beauty products.
 
 USER PROFILE: {profile_summary}
 USER CONSTRAINTS: {constraints}{context_info}
 
 YOUR PROCESS:
-1. ALWAYS check database first using check_database tool
-2. If not found or stale, use web_search to verify
-3. When recommending alternatives, ALWAYS respect user constraints: {constraints}
-4. Save new verifications to database
-5. Be conversational and remember the user's preferences
+1. ALWAYS check database first using check_database tool, unless the brand's facts are already given above
+2. For questions about several brands (a parent company's brands, vegan or certified brands), use search_database
+3. If not found or stale, use web_search to verify
+4. When recommending alternatives, use find_alternatives first (web_search only if it finds nothing) and ALWAYS respect user constraints: {constraints}
+5. Save new verifications to database
+6. Be conversational and remember the user's preferences
 
 IMPORTANT:
 - When suggesting alternatives, filter by user's budget if known
@@ -569,63 +2059,133 @@ RESPONSE STYLE:
 
         messages = [{"role": "user", "content": user_query}]
         
-        # Agentic loop
+        # Agentic loop, one trace span per iteration
+        iteration = 0
         while True:
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=4000,
-                temperature=0.3,
-                system=system_prompt,
-                tools=self.tools,
-                messages=messages
-            )
-            
-            if response.stop_reason == "tool_use":
-                tool_use_block = next(
-                    block for block in response.content 
-                    if block.type == "tool_use"
-                )
+            iteration += 1
+            with tracing.span("iteration", number=iteration):
+                if budget.check_llm():
+                    return self._budget_exhausted(messages, gathered)
                 
-                tool_name = tool_use_block.name
-                tool_input = tool_use_block.input
+                try:
+                    response = self._call_llm(
+                        model=self.model,
+                        max_tokens=4000,
+                        temperature=0.3,
+                        system=system_prompt,
+                        tools=self.tools,
+                        messages=messages
+                    )
+                except TimeoutError:
+                    # The deadline passed queued for a scheduler slot or waiting on the API
+                    budget.exhausted_by = "deadline"
+                    return self._budget_exhausted(messages, gathered)
+                # How the loop ended, for _process_query's response cache
+                self._local.stop_reason = response.stop_reason
                 
-                # Track brand
-                if tool_name == "check_database":
-                    self.last_brand_discussed = tool_input.get("brand_name")
-                
-                tool_result = self._execute_tool(tool_name, tool_input)
+                if response.stop_reason == "tool_use":
+                    tool_use_block = next(
+                        block for block in response.content 
+                        if block.type == "tool_use"
+                    )
+                    
+                    tool_name = tool_use_block.name
+                    tool_input = tool_use_block.input
+                    
+                    if budget.check_tool():
+                        messages.append({"role": "assistant", "content": response.content})
+                        return self._budget_exhausted(messages, gathered)
+                    budget.record_tool_call()
+                    
+                    # Track brand
+                    if tool_name == "check_database":
+                        self.last_brand_discussed = tool_input.get("brand_name")
+                    
+                    tool_result = self._execute_tool(tool_name, tool_input)
+                    gathered.append((tool_name, tool_result))
+                    
+                    messages.append({
+                        "role": "assistant",
+                        "content": response.content
+                    })
+                    
+                    messages.append({
+                        "role": "user",
+                        "content": [
+                            {
+                                "type": "tool_result",
+                                "tool_use_id": tool_use_block.id,
+                                "content": json.dumps(tool_result)
+                            }
+                        ]
+                    })
+                    
+                    continue
                 
-                messages.append({
-                    "role": "assistant",
-                    "content": response.content
-                })
+                elif response.stop_reason == "end_turn":
+                    final_text = next(
+                        (block.text for block in response.content if hasattr(block, "text")),
+                        ""
+                    )
+                    
+                    self.last_recommendation = self.last_recommendation or {"price": 10}
+                    self._confirm_extracted_brand(final_text)
+                    
+                    return final_text, self.tool_calls
                 
-                messages.append({
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "tool_result",
-                            "tool_use_id": tool_use_block.id,
-                            "content": json.dumps(tool_result)
-                        }
-                    ]
-                })
+                elif response.stop_reason == "max_tokens" and budget.remaining_tokens() <= 0:
+                    budget.exhausted_by = "max_tokens"
+                    messages.append({"role": "assistant", "content": response.content})
+                    return self._budget_exhausted(messages, gathered)
                 
-                continue
+                break
             
-            elif response.stop_reason == "end_turn":
-                final_text = next(
-                    (block.text for block in response.content if hasattr(block, "text")),
-                    ""
-                )
-                
-                self.last_recommendation = {"price": 10}
-                
-                return final_text, self.tool_calls
-            
-            break
-        
         return "Error in processing", self.tool_calls
+    
+    def _confirm_extracted_brand(self, final_text: str):
+        """Make a pre-looked-up brand the topic once the answer is about it and the model checked nothing itself"""
+        if any(call["tool"] == "check_database" and call.get("cache") != "extracted" for call in self.tool_calls):
+            return  # the loop's own check_database call already set it
+        answer = f" {normalize_brand_name(final_text)} "
+        for call in self.tool_calls:
+            if call.get("cache") == "extracted" and f" {normalize_brand_name(call['input']['brand_name'])} " in answer:
+                self.last_brand_discussed = call["input"]["brand_name"]
+                return
+    
+    def _lookup_mentioned_brands(self, user_query: str) -> list:
+        """Batch check_database for every known brand the query mentions, as (tool, result) pairs"""
+        if not self.brand_extractor:
+            return []
+        with tracing.span("brand_extraction") as extract_span:
+            mentions = self.brand_extractor.extract(user_query)
+            extract_span.set(mentions=mentions)
+        if not mentions:
+            return []
+        
+        gathered = []
+        for name, result in self._check_database_batch(mentions).items():
+            if not result["found"]:
+                continue
+            self.tool_calls.append({
+                "tool": "check_database",
+                "input": {"brand_name": name},
+                "timestamp": datetime.now().isoformat(),
+                "cache": "extracted"
+            })
+            gathered.append(("check_database", result))
+            self.memory.remember_brand(result)
+        # last_brand_discussed is left alone: an extraction alone doesn't make a brand the topic
+        return gathered
+    
+    def _budget_exhausted(self, messages: list, gathered: list) -> tuple:
+        """Finish a query whose budget ran out, recording which one in the tool-call metadata"""
+        budget = self.current_budget
+        self.tool_calls.append({
+            "tool": "budget_exhausted",
+            "input": {"budget": budget.exhausted_by, **budget.to_dict()},
+            "timestamp": datetime.now().isoformat()
+        })
+        return self._best_effort_answer(messages, gathered, budget.exhausted_by), self.tool_calls
 
 
 if __name__ == "__main__":
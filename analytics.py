@@ -0,0 +1,122 @@
+"""
+ConsciousCart - Brand Analytics
+Materialized cruelty-free summaries by parent company, category and price tier,
+kept current by triggers on the brands table so dashboards read them in constant time
+"""
+import sqlite3
+
+# dimension name -> SQL expression over a brands row (NEW./OLD. prefix added per trigger)
+DIMENSIONS = {
+    "parent_company": "COALESCE({row}parent_company, 'Independent')",
+    "category": "COALESCE({row}category, 'Unknown')",
+    "price_tier": "COALESCE({row}price_tier, 'Unknown')"
+}
+
+
+def _apply_sql(row: str, sign: str) -> str:
+    """Statements adding (+) or removing (-) one brands row from every summary"""
+    statements = []
+    for dimension, expression in DIMENSIONS.items():
+        key = expression.format(row=row)
+        statements.append(f"""
+            INSERT INTO brand_stats (dimension, key, total, cruelty_free)
+            VALUES ('{dimension}', {key}, {sign}1, {sign}{row}is_cruelty_free)
+            ON CONFLICT(dimension, key) DO UPDATE SET
+                total = total + excluded.total,
+                cruelty_free = cruelty_free + excluded.cruelty_free;""")
+    if sign == "-":
+        statements.append("DELETE FROM brand_stats WHERE total <= 0;")
+    return "".join(statements)
+
+
+def init_analytics(cursor):
+    """Create the summary table and the triggers that maintain it incrementally"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'brand_stats'")
+    exists = cursor.fetchone() is not None
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS brand_stats (
+            dimension TEXT NOT NULL,
+            key TEXT NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            cruelty_free INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, key)
+        )
+    """)
+
+    cursor.executescript(f"""
+        CREATE TRIGGER IF NOT EXISTS brand_stats_ai AFTER INSERT ON brands BEGIN
+            {_apply_sql("NEW.", "+")}
+        END;
+        CREATE TRIGGER IF NOT EXISTS brand_stats_ad AFTER DELETE ON brands BEGIN
+            {_apply_sql("OLD.", "-")}
+        END;
+        CREATE TRIGGER IF NOT EXISTS brand_stats_au
+        AFTER UPDATE OF is_cruelty_free, parent_company, category, price_tier ON brands BEGIN
+            {_apply_sql("OLD.", "-")}
+            {_apply_sql("NEW.", "+")}
+        END;
+    """)
+
+    if not exists:
+        recompute(cursor)
+
+
+def recompute(cursor):
+    """Rebuild every summary from scratch with one set-based GROUP BY per dimension (for backfills)"""
+    cursor.execute("DELETE FROM brand_stats")
+    for dimension, expression in DIMENSIONS.items():
+        key = expression.format(row="")
+        cursor.execute(f"""
+            INSERT INTO brand_stats (dimension, key, total, cruelty_free)
+            SELECT '{dimension}', {key}, COUNT(*), SUM(is_cruelty_free)
+            FROM brands
+            GROUP BY {key}
+        """)
+
+
+def get_summary(db_path: str, dimension: str, limit: int = 20) -> list:
+    """Cruelty-free counts and share per key of one dimension, largest groups first"""
+    if dimension not in DIMENSIONS:
+        raise ValueError(f"Unknown dimension: {dimension}")
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT key, total, cruelty_free
+        FROM brand_stats
+        WHERE dimension = ?
+        ORDER BY total DESC, key
+        LIMIT ?
+    """, (dimension, limit))
+    rows = cursor.fetchall()
+    conn.close()
+
+    return [
+        {
+            "key": key,
+            "total": total,
+            "cruelty_free": cruelty_free,
+            "cruelty_free_share": cruelty_free / total if total else 0.0
+        }
+        for key, total, cruelty_free in rows
+    ]
+
+
+def get_overview(db_path: str) -> dict:
+    """Catalog-wide totals (every brand has exactly one parent_company key)"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT COALESCE(SUM(total), 0), COALESCE(SUM(cruelty_free), 0)
+        FROM brand_stats
+        WHERE dimension = 'parent_company'
+    """)
+    total, cruelty_free = cursor.fetchone()
+    conn.close()
+
+    return {
+        "total_brands": total,
+        "cruelty_free": cruelty_free,
+        "cruelty_free_share": cruelty_free / total if total else 0.0
+    }
@@ -3,12 +3,15 @@ ConsciousCart - Enhanced UI with Confidence Scoring & Analytics
 Shows verification confidence and agent decision-making stats
 """
 import streamlit as st
+import html
 import sys
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent))
 
 from agent import ConsciousCartAgent
+import analytics
+import certifications
 
 # Page config
 st.set_page_config(
@@ -192,9 +195,72 @@ st.markdown("""
         color: #721c24;
         border: 1px solid #f5c6cb;
     }
+    
+    /* Trace waterfall */
+    .trace-row {
+        display: flex;
+        align-items: center;
+        font-size: 0.78em;
+        margin: 2px 0;
+    }
+    
+    .trace-label {
+        flex: 0 0 40%;
+        font-family: 'Monaco', 'Courier New', monospace;
+        white-space: nowrap;
+        overflow: hidden;
+        text-overflow: ellipsis;
+    }
+    
+    .trace-track {
+        flex: 1;
+        position: relative;
+        height: 14px;
+        background: rgba(255,255,255,0.6);
+        border-radius: 3px;
+    }
+    
+    .trace-bar {
+        position: absolute;
+        height: 100%;
+        min-width: 2px;
+        border-radius: 3px;
+        background: #7a9b76;
+    }
+    
+    .trace-bar.llm { background: #c49a6c; }
+    .trace-bar.db { background: #6b8fb5; }
+    .trace-bar.error { background: #c0392b; }
 </style>
 """, unsafe_allow_html=True)
 
+def render_waterfall(trace: dict):
+    """Latency waterfall of a request trace: one bar per span, indented by depth"""
+    total = trace["duration_ms"] or 1
+    depth = {}
+    rows = []
+    for span in trace["spans"]:
+        depth[span["span_id"]] = depth.get(span["parent_id"], -1) + 1
+        kind = "error" if "error" in span["attributes"] else \
+            "llm" if span["name"].startswith("llm") else "db" if span["name"].startswith("db") else ""
+        left = span["start_ms"] / total * 100
+        width = span["duration_ms"] / total * 100
+        rows.append(f"""
+        <div class="trace-row" title="{html.escape(str(span['attributes']))}">
+            <div class="trace-label">{'&nbsp;&nbsp;' * depth[span['span_id']]}{span['name']} · {span['duration_ms']:.0f} ms</div>
+            <div class="trace-track"><div class="trace-bar {kind}" style="left: {left:.1f}%; width: {width:.1f}%;"></div></div>
+        </div>""")
+    st.markdown(f"**⏱️ Timeline** ({total:.0f} ms)" + "".join(rows), unsafe_allow_html=True)
+
+
+def render_profile(profile: dict):
+    """Hottest functions of a profiled request"""
+    lines = [f"**🔥 Profile** ({profile['samples']} samples)"]
+    for row in profile["hot"][:8]:
+        lines.append(f"- `{row['function']}` · {row['self_ms']:.0f} ms self ({row['total_pct']:.0f}% incl.)")
+    st.markdown("\n".join(lines))
+
+
 # Initialize agent
 if "agent" not in st.session_state:
     st.session_state.agent = ConsciousCartAgent()
@@ -250,6 +316,10 @@ with col1:
                             <div class="tool-input">{tool_call['input']}</div>
                         </div>
                         """, unsafe_allow_html=True)
+                    if message.get("trace"):
+                        render_waterfall(message["trace"])
+                    if message.get("profile"):
+                        render_profile(message["profile"])
             
             # Show message content
             st.markdown(message["content"])
@@ -300,6 +370,10 @@ with col1:
                                     <div class="tool-input">{tool_call['input']}</div>
                                 </div>
                                 """, unsafe_allow_html=True)
+                            if agent.last_trace:
+                                render_waterfall(agent.last_trace)
+                            if agent.last_profile:
+                                render_profile(agent.last_profile)
                     
                     # Show response
                     st.markdown(response)
@@ -309,7 +383,9 @@ with col1:
                         "role": "assistant",
                         "content": response,
                         "tools": tools_used,
-                        "confidence": confidence_score
+                        "confidence": confidence_score,
+                        "trace": agent.last_trace,
+                        "profile": agent.last_profile
                     })
                     
                 except Exception as e:
@@ -409,7 +485,12 @@ with col2:
             tool_emojis = {
                 "check_database": "💾",
                 "web_search": "🌐",
-                "save_to_database": "💿"
+                "save_to_database": "💿",
+                "search_database": "🗂️",
+                "find_alternatives": "🛍️",
+                "local_feedback": "⚡",
+                "negative_cache": "🚫",
+                "budget_exhausted": "⏱️"
             }
             
             for tool, count in tool_counts.items():
@@ -420,6 +501,34 @@ with col2:
     
     st.markdown("---")
     
+    # CATALOG INSIGHTS (materialized summaries, constant-time reads)
+    st.markdown("## 📚 Catalog Insights")
+    
+    overview = analytics.get_overview(agent.db_path)
+    col_a, col_b = st.columns(2)
+    with col_a:
+        st.metric("🏷️ Brands Verified", overview["total_brands"])
+    with col_b:
+        st.metric("🐰 Cruelty-Free", f"{overview['cruelty_free_share']:.0%}")
+    
+    st.markdown("### 🏢 By Parent Company")
+    for row in analytics.get_summary(agent.db_path, "parent_company", limit=5):
+        st.progress(
+            row["cruelty_free_share"],
+            text=f"**{row['key']}:** {row['cruelty_free']}/{row['total']} cruelty-free"
+        )
+    
+    st.markdown("### 🏅 By Certifier")
+    certifier_rows = certifications.certifier_counts(agent.db_path)
+    for row in certifier_rows[:5]:
+        st.markdown(f"**{row['certifier']}:** {row['brands']} certified brands")
+    if certifier_rows:
+        certifier = st.selectbox("Brands certified by", [row["certifier"] for row in certifier_rows])
+        certified = certifications.brands_certified_by(agent.db_path, certifier, limit=20)
+        st.markdown(", ".join(brand["brand_name"] for brand in certified))
+    
+    st.markdown("---")
+    
     # HOW IT WORKS
     st.markdown("## 🔬 How It Works")
     st.markdown("---")
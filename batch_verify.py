@@ -0,0 +1,261 @@
+"""
+ConsciousCart - Batch Re-verification
+Nightly job that re-researches every stale or low-confidence brand through the Message
+Batches API (or a local stand-in), checkpointing each submitted batch so a crashed run
+resumes where it stopped, and bulk-upserts the verdicts with origin "batch"
+
+Usage:
+    python batch_verify.py [--db brands.db] [--batch-size 500] [--confidence-below 0.75]
+    python batch_verify.py --backend local --stub --limit 50   # offline, no API key
+    python batch_verify.py --dry-run
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import scheduler
+from agent import (DEFAULT_MODEL, REVERIFY_QUERY, VerificationResult, brand_record,
+                   findings_from_content, search_request, write_brand_records)
+from rescore import score_confidence
+
+
+def select_brands(db_path: str, confidence_below: float = 0.75, limit: int = None) -> list:
+    """(id, name, parent_company) of every stale or low-confidence brand, stalest first"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id, name, parent_company
+        FROM brands
+        WHERE expires_at IS NULL OR expires_at <= CURRENT_TIMESTAMP OR confidence < ?
+        ORDER BY expires_at, name
+        LIMIT ?
+    """, (confidence_below, limit if limit is not None else -1))
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+
+class AnthropicBatchBackend:
+    """Message Batches API: half-price, results within 24h, batch ids survive a crash"""
+
+    def __init__(self, client, poll_seconds: float = 60):
+        self.client = client
+        self.poll_seconds = poll_seconds
+
+    def submit(self, requests: list) -> str:
+        batch = self.client.beta.messages.batches.create(requests=requests)
+        return batch.id
+
+    def results(self, batch_id: str):
+        """{custom_id: content blocks} of the succeeded requests, once the batch has ended"""
+        batches = self.client.beta.messages.batches
+        while batches.retrieve(batch_id).processing_status != "ended":
+            time.sleep(self.poll_seconds)
+        return {
+            entry.custom_id: entry.result.message.content
+            for entry in batches.results(batch_id)
+            if entry.result.type == "succeeded"
+        }
+
+
+class LocalBatchBackend:
+    """Runs each request through messages.create at batch priority; batches live in memory only"""
+
+    def __init__(self, client, workers: int = 4):
+        self.client = client
+        self.workers = workers
+        self._batches = {}
+
+    def submit(self, requests: list) -> str:
+        batch_id = f"local_{uuid.uuid4().hex[:12]}"
+        self._batches[batch_id] = requests
+        return batch_id
+
+    def _run(self, request: dict):
+        try:
+            with scheduler.get_scheduler().slot("batch"):
+                return request["custom_id"], self.client.messages.create(**request["params"]).content
+        except Exception as e:
+            print(f"[Batch] {request['custom_id']} failed: {e}")
+            return request["custom_id"], None
+
+    def results(self, batch_id: str):
+        """None when the batch is unknown (submitted by a run that crashed): resubmit it"""
+        requests = self._batches.pop(batch_id, None)
+        if requests is None:
+            return None
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return {custom_id: content for custom_id, content in pool.map(self._run, requests) if content is not None}
+
+
+class BatchVerifier:
+    """Selects, submits, collects and applies; every state change is checkpointed first"""
+
+    def __init__(self, db_path: str, backend, checkpoint_path: str = "batch_checkpoint.json",
+                 model: str = DEFAULT_MODEL, batch_size: int = 500):
+        self.db_path = db_path
+        self.backend = backend
+        self.checkpoint_path = checkpoint_path
+        self.model = model
+        self.batch_size = batch_size
+
+    def _load_checkpoint(self) -> dict:
+        if not os.path.exists(self.checkpoint_path):
+            return {"chunks": []}
+        with open(self.checkpoint_path, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        pending = sum(1 for chunk in checkpoint["chunks"] if chunk["status"] != "applied")
+        print(f"[Batch] Resuming from {self.checkpoint_path}: {pending} of {len(checkpoint['chunks'])} batches pending")
+        return checkpoint
+
+    def _save_checkpoint(self, checkpoint: dict):
+        # Write-then-rename so a crash mid-write never leaves a truncated checkpoint
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f, indent=2)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _submit(self, chunk: dict):
+        chunk["batch_id"] = self.backend.submit([
+            {"custom_id": custom_id, "params": search_request(self.model, REVERIFY_QUERY.format(brand=brand["name"]))}
+            for custom_id, brand in chunk["brands"].items()
+        ])
+        chunk["status"] = "submitted"
+        print(f"[Batch] Submitted {len(chunk['brands'])} brands as {chunk['batch_id']}")
+
+    def _records(self, chunk: dict, results: dict) -> tuple:
+        """Verdict records for the conclusive results, plus counts of what was skipped"""
+        verified = []
+        counts = {"inconclusive": 0, "failed": 0}
+        for custom_id, brand in chunk["brands"].items():
+            result = findings_from_content(results[custom_id]) if custom_id in results else None
+            if result is None:
+                counts["failed"] += 1
+                continue
+            verification = VerificationResult.from_findings(brand["name"], result["findings"])
+            if verification.is_cruelty_free is None:
+                counts["inconclusive"] += 1
+                continue
+            verified.append((brand, result, verification))
+
+        # One vectorized scoring pass for the whole batch
+        confidences = score_confidence(
+            [verification.sources_count for _, _, verification in verified],
+            [verification.has_conflicts for _, _, verification in verified]
+        )
+        records = [
+            brand_record(
+                brand["name"],
+                verification.is_cruelty_free,
+                brand["parent_company"],
+                result["summary"][:500],
+                list(dict.fromkeys(finding["source"] for finding in verification.findings)),
+                confidence=float(confidence),
+                sources_count=verification.sources_count,
+                has_conflicts=verification.has_conflicts,
+                origin="batch",
+                findings=verification.findings
+            )
+            for (brand, result, verification), confidence in zip(verified, confidences)
+        ]
+        return records, counts
+
+    def _apply(self, chunk: dict, results: dict):
+        records, counts = self._records(chunk, results)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            write_brand_records(conn.cursor(), records)
+            conn.commit()
+        finally:
+            conn.close()
+        chunk.update(status="applied", saved=len(records), **counts)
+        print(f"[Batch] {chunk['batch_id']}: saved {len(records)}, "
+              f"inconclusive {counts['inconclusive']}, failed {counts['failed']}")
+
+    def run(self, confidence_below: float = 0.75, limit: int = None, dry_run: bool = False) -> dict:
+        checkpoint = self._load_checkpoint()
+
+        # Brands already in the checkpoint belong to this run; don't select them twice
+        claimed = {brand["name"] for chunk in checkpoint["chunks"] for brand in chunk["brands"].values()}
+        targets = [row for row in select_brands(self.db_path, confidence_below, limit) if row[1] not in claimed]
+        print(f"[Batch] {len(targets)} brands to re-verify")
+        if dry_run:
+            for _, name, _ in targets:
+                print(f"   {name}")
+            return {"selected": len(targets)}
+
+        for i in range(0, len(targets), self.batch_size):
+            checkpoint["chunks"].append({
+                "batch_id": None,
+                "status": "new",
+                "brands": {
+                    # Batch custom_ids allow [a-zA-Z0-9_-] only, so key by row id
+                    f"brand-{brand_id}": {"name": name, "parent_company": parent}
+                    for brand_id, name, parent in targets[i:i + self.batch_size]
+                }
+            })
+
+        # Submit everything first so the batches are processed in parallel
+        for chunk in checkpoint["chunks"]:
+            if chunk["status"] == "new":
+                self._submit(chunk)
+                self._save_checkpoint(checkpoint)
+
+        for chunk in checkpoint["chunks"]:
+            if chunk["status"] != "submitted":
+                continue
+            results = self.backend.results(chunk["batch_id"])
+            if results is None:
+                print(f"[Batch] {chunk['batch_id']} unknown to the backend, resubmitting")
+                self._submit(chunk)
+                self._save_checkpoint(checkpoint)
+                results = self.backend.results(chunk["batch_id"])
+            self._apply(chunk, results)
+            self._save_checkpoint(checkpoint)
+
+        summary = {
+            key: sum(chunk.get(key, 0) for chunk in checkpoint["chunks"])
+            for key in ("saved", "inconclusive", "failed")
+        }
+        summary["batches"] = len(checkpoint["chunks"])
+        # Finished: the next run starts from a fresh selection
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-verify stale and low-confidence brands in batches")
+    parser.add_argument("--db", default="brands.db", help="path to brands.db")
+    parser.add_argument("--checkpoint", default="batch_checkpoint.json", help="resume state file")
+    parser.add_argument("--batch-size", type=int, default=500, help="brands per submitted batch")
+    parser.add_argument("--confidence-below", type=float, default=0.75, help="also re-verify fresh rows under this")
+    parser.add_argument("--limit", type=int, help="at most this many brands")
+    parser.add_argument("--backend", choices=["anthropic", "local"], default="anthropic")
+    parser.add_argument("--stub", action="store_true", help="local backend answers from the load test stub")
+    parser.add_argument("--poll-seconds", type=float, default=60)
+    parser.add_argument("--dry-run", action="store_true", help="list the selection only")
+    args = parser.parse_args()
+
+    if args.stub:
+        from loadtest import StubModelClient
+
+        client = StubModelClient(latency_ms=0, rng=random.Random(0))
+        args.backend = "local"
+    else:
+        from anthropic import Anthropic
+
+        client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+
+    if args.backend == "anthropic":
+        backend = AnthropicBatchBackend(client, args.poll_seconds)
+    else:
+        backend = LocalBatchBackend(client)
+
+    verifier = BatchVerifier(args.db, backend, args.checkpoint, batch_size=args.batch_size)
+    print(json.dumps(verifier.run(args.confidence_below, args.limit, args.dry_run), indent=2))
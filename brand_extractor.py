@@ -0,0 +1,130 @@
+"""
+ConsciousCart - Brand Mention Extraction
+Aho-Corasick automaton over the full name of every brand in brands.db, so the brands a
+query mentions can be looked up before the first LLM call. Shortened aliases ("Milk" for
+Milk Makeup) stay with explicit check_database lookups; free text would match them by accident.
+"""
+import re
+import sqlite3
+import threading
+from collections import deque
+
+from brand_names import full_name_aliases, is_common_phrase, normalize_brand_name
+
+_extractors = {}
+_extractors_lock = threading.Lock()
+
+
+class BrandExtractor:
+    """Finds brand mentions in one linear pass over the normalized query"""
+
+    def __init__(self, names: list = ()):
+        self._lock = threading.Lock()
+        # Trie as parallel lists: child edges, failure link, (alias, brand) ending here
+        self._children = [{}]
+        self._fail = [0]
+        self._output = [None]
+        self._dirty = False
+        self.brand_count = 0
+        for name in names:
+            self.add(name)
+
+    def add(self, brand_name: str):
+        """Index a brand under its full name; failure links are refreshed on the next lookup"""
+        with self._lock:
+            added = False
+            for alias in full_name_aliases(brand_name):
+                node = 0
+                for ch in alias:
+                    child = self._children[node].get(ch)
+                    if child is None:
+                        child = len(self._children)
+                        self._children[node][ch] = child
+                        self._children.append({})
+                        self._fail.append(0)
+                        self._output.append(None)
+                    node = child
+                if self._output[node] is None:
+                    added = True
+                    self._output[node] = (alias, brand_name)
+            if added:
+                self.brand_count += 1
+                self._dirty = True
+
+    def _build_failure_links(self):
+        """Breadth-first pass over the trie, O(total alias length)"""
+        queue = deque()
+        for child in self._children[0].values():
+            self._fail[child] = 0
+            queue.append(child)
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._children[node].items():
+                fail = self._fail[node]
+                while fail and ch not in self._children[fail]:
+                    fail = self._fail[fail]
+                target = self._children[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                queue.append(child)
+        self._dirty = False
+
+    def extract(self, text: str) -> list:
+        """Brands mentioned in the text, in order of appearance (longest match wins)"""
+        normalized = normalize_brand_name(text)
+        if not normalized:
+            return []
+
+        with self._lock:
+            if self._dirty:
+                self._build_failure_links()
+
+            # Every alias occurrence as (start, end, brand)
+            matches = []
+            node = 0
+            for i, ch in enumerate(normalized):
+                while node and ch not in self._children[node]:
+                    node = self._fail[node]
+                node = self._children[node].get(ch, 0)
+                hit = node
+                while hit:
+                    if self._output[hit]:
+                        alias, brand = self._output[hit]
+                        matches.append((i + 1 - len(alias), i + 1, alias, brand))
+                    hit = self._fail[hit]
+
+        # Whole words only ("mac" is not in "machine"), then leftmost-longest without overlaps
+        matches = [
+            (start, end, alias, brand) for start, end, alias, brand in matches
+            if (start == 0 or normalized[start - 1] == " ") and (end == len(normalized) or normalized[end] == " ")
+        ]
+        matches.sort(key=lambda m: (m[0], -(m[1] - m[0])))
+
+        brands = []
+        covered = 0
+        for start, end, alias, brand in matches:
+            if is_common_phrase(alias) and not _written_as_name(text, alias):
+                continue
+            if start >= covered:
+                covered = end
+                if brand not in brands:
+                    brands.append(brand)
+        return brands
+
+
+def _written_as_name(text: str, alias: str) -> bool:
+    """"MAC" or "Essence" rather than "a mac" or "the essence of": some occurrence is capitalized"""
+    pattern = r"\b" + r"\W+".join(re.escape(word) for word in alias.split()) + r"\b"
+    return any(match.group()[0].isupper() for match in re.finditer(pattern, text, re.IGNORECASE))
+
+
+def get_brand_extractor(db_path: str) -> BrandExtractor:
+    """Process-wide extractor per database file, built once from brands.db and kept current by saves"""
+    with _extractors_lock:
+        extractor = _extractors.get(db_path)
+        if extractor is None:
+            conn = sqlite3.connect(db_path)
+            names = [name for (name,) in conn.execute("SELECT name FROM brands")]
+            conn.close()
+            extractor = BrandExtractor(names)
+            _extractors[db_path] = extractor
+        return extractor
@@ -0,0 +1,52 @@
+"""
+ConsciousCart - Brand Name Normalization
+Shared keys for exact lookups, snapshots and caches
+"""
+import re
+import unicodedata
+
+# Generic trailing words users often leave off ("Fenty" for "Fenty Beauty")
+GENERIC_SUFFIXES = ("cosmetics", "beauty", "makeup", "skincare", "cosmetic", "labs")
+
+# Everyday words that are also brand names ("a mac", "the essence of", "milk"); free text
+# only counts them as a brand when written like one ("MAC", "Essence")
+COMMON_WORDS = frozenset({
+    "mac", "essence", "milk", "honest", "pure", "clean", "native", "fresh", "simple", "glow",
+    "bare", "benefit", "origins", "kind", "bliss", "revolution", "nature", "natural", "ordinary",
+    "the", "love", "first", "aid", "real", "formula", "cover", "good", "organic", "vegan",
+    "wild", "wet"
+})
+
+
+def normalize_brand_name(name: str) -> str:
+    """Lowercase, strip accents and punctuation, collapse whitespace ("L'Oréal" -> "loreal")"""
+    text = unicodedata.normalize("NFKD", name or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    text = re.sub(r"['’.]", "", text)
+    text = re.sub(r"[^a-z0-9]+", " ", text)
+    return text.strip()
+
+
+def brand_aliases(name: str) -> set:
+    """All normalized keys a brand should be found under"""
+    normalized = normalize_brand_name(name)
+    if not normalized:
+        return set()
+
+    aliases = {normalized, normalized.replace(" ", "")}
+    words = normalized.split()
+    if len(words) > 1 and words[-1] in GENERIC_SUFFIXES:
+        base = " ".join(words[:-1])
+        aliases.update({base, base.replace(" ", "")})
+    return aliases
+
+
+def full_name_aliases(name: str) -> set:
+    """Keys for spotting a brand in free text: the full name only, never a shortened alias"""
+    normalized = normalize_brand_name(name)
+    return {normalized, normalized.replace(" ", "")} if normalized else set()
+
+
+def is_common_phrase(alias: str) -> bool:
+    """True when every word of the alias is an everyday word ("mac", "the ordinary")"""
+    return all(word in COMMON_WORDS for word in alias.split())
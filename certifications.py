@@ -0,0 +1,166 @@
+"""
+ConsciousCart - Certifications
+Normalized (brand, certifier, status, verified date) rows parsed once at write time from
+brands.sources, so "every Leaping Bunny brand" is an indexed lookup instead of a string scan.
+Only the certifiers below get rows; retailers, brand sites and news stay in brands.sources
+"""
+import re
+import sqlite3
+
+# Canonical certifier names; sources mentioning one of these keys are filed under it
+CERTIFIERS = {
+    "leaping bunny": "Leaping Bunny",
+    "cruelty-free international": "Cruelty-Free International",
+    "peta": "PETA",
+    "cruelty-free kitty": "Cruelty-Free Kitty",
+    "logical harmony": "Logical Harmony",
+    "ethical elephant": "Ethical Elephant"
+}
+CERTIFIER_NAMES = set(CERTIFIERS.values())
+
+# Status a certifier's own finding implies (findings.verdict)
+VERDICT_STATUS = {"cruelty_free": "certified", "not_cruelty_free": "not_certified"}
+
+
+def canonical_certifier(source: str) -> str:
+    """"leaping bunny database" -> "Leaping Bunny"; unknown sources keep their own name"""
+    key = source.strip().lower().replace("cruelty free", "cruelty-free")
+    for name, canonical in CERTIFIERS.items():
+        if re.search(rf"\b{re.escape(name)}\b", key):
+            return canonical
+    return source.strip()
+
+
+def source_key(source: str) -> str:
+    """Dedup key: every spelling of one certifier shares it ("PETA", "PETA Cruelty-Free Database" -> "peta")"""
+    return canonical_certifier(source).lower()
+
+
+def finding_statuses(findings: list) -> dict:
+    """{certifier: status} from the per-source verdicts of known certifiers, first finding wins"""
+    statuses = {}
+    for finding in findings or []:
+        certifier = canonical_certifier(finding.get("source") or "")
+        if certifier in CERTIFIER_NAMES and finding.get("verdict") in VERDICT_STATUS:
+            statuses.setdefault(certifier, VERDICT_STATUS[finding["verdict"]])
+    return statuses
+
+
+def init_certifications(cursor):
+    """Create the table, its indexes and the trigger that removes a deleted brand's rows"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS certifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            brand_id INTEGER NOT NULL,
+            certifier TEXT NOT NULL,
+            status TEXT NOT NULL,
+            verified_date TIMESTAMP,
+            UNIQUE(brand_id, certifier)
+        )
+    """)
+    # Certifier filters read (certifier, status) and join back on brand_id without touching the table
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_certifications_certifier_status
+        ON certifications(certifier, status, brand_id)
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS certifications_brand_ad AFTER DELETE ON brands BEGIN
+            DELETE FROM certifications WHERE brand_id = OLD.id;
+        END
+    """)
+
+
+def _certification_rows(brand_id: int, is_cruelty_free: bool, sources: str, verified_date,
+                        statuses: dict = None) -> list:
+    """Rows for the known certifiers among the sources; a certifier's own verdict beats the brand's"""
+    statuses = statuses or {}
+    default = "certified" if is_cruelty_free else "not_certified"
+    certifiers = dict.fromkeys(
+        certifier for certifier in (canonical_certifier(source) for source in (sources or "").split(",") if source.strip())
+        if certifier in CERTIFIER_NAMES
+    )
+    certifiers.update(dict.fromkeys(statuses))
+    return [(brand_id, certifier, statuses.get(certifier, default), verified_date) for certifier in certifiers]
+
+
+def refresh_certifications(cursor, brand_names: list, statuses: dict = None):
+    """Re-derive the certifications of these brands from their current row, in the caller's transaction.
+
+    statuses maps a brand name to finding_statuses() of the search that verified it.
+    """
+    statuses = statuses or {}
+    rows = []
+    for i in range(0, len(brand_names), 500):
+        chunk = brand_names[i:i + 500]
+        cursor.execute(f"""
+            SELECT id, name, is_cruelty_free, sources, last_verified
+            FROM brands
+            WHERE name IN ({",".join("?" * len(chunk))})
+        """, chunk)
+        rows.extend(cursor.fetchall())
+
+    cursor.executemany("DELETE FROM certifications WHERE brand_id = ?", [(row[0],) for row in rows])
+    cursor.executemany("""
+        INSERT INTO certifications (brand_id, certifier, status, verified_date)
+        VALUES (?, ?, ?, ?)
+    """, [
+        cert
+        for brand_id, name, is_cruelty_free, sources, verified_date in rows
+        for cert in _certification_rows(brand_id, is_cruelty_free, sources, verified_date, statuses.get(name))
+    ])
+
+
+def backfill_certifications(cursor) -> int:
+    """Migrate brands that have sources but no certification rows yet (pre-table rows, seeds)"""
+    # Rows filed under retailers or brand sites by earlier versions aren't certifications
+    cursor.execute(f"""
+        DELETE FROM certifications WHERE certifier NOT IN ({",".join("?" * len(CERTIFIER_NAMES))})
+    """, sorted(CERTIFIER_NAMES))
+    cursor.execute("""
+        SELECT id, is_cruelty_free, sources, last_verified
+        FROM brands b
+        WHERE sources IS NOT NULL AND sources != ''
+          AND NOT EXISTS (SELECT 1 FROM certifications c WHERE c.brand_id = b.id)
+    """)
+    rows = [cert for row in cursor.fetchall() for cert in _certification_rows(*row)]
+    cursor.executemany("""
+        INSERT OR IGNORE INTO certifications (brand_id, certifier, status, verified_date)
+        VALUES (?, ?, ?, ?)
+    """, rows)
+    return len(rows)
+
+
+def certifier_counts(db_path: str) -> list:
+    """Certified brand count per certifier, largest first"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT certifier, COUNT(*)
+        FROM certifications
+        WHERE status = 'certified'
+        GROUP BY certifier
+        ORDER BY COUNT(*) DESC, certifier
+    """)
+    rows = cursor.fetchall()
+    conn.close()
+    return [{"certifier": certifier, "brands": count} for certifier, count in rows]
+
+
+def brands_certified_by(db_path: str, certifier: str, limit: int = 50) -> list:
+    """Brands a certifier lists as cruelty-free, most recently verified first"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT b.name, b.parent_company, c.verified_date
+        FROM certifications c
+        JOIN brands b ON b.id = c.brand_id
+        WHERE c.certifier = ? AND c.status = 'certified'
+        ORDER BY c.verified_date DESC, b.name
+        LIMIT ?
+    """, (canonical_certifier(certifier), limit))
+    rows = cursor.fetchall()
+    conn.close()
+    return [
+        {"brand_name": name, "parent_company": parent, "verified_date": verified_date}
+        for name, parent, verified_date in rows
+    ]
@@ -1,47 +1,320 @@
 """
-Debug script to view agent's learned information
+ConsciousCart - Inspector CLI
+Read-only health report for a live brands.db (safe against a running WAL database)
+plus explicit maintenance commands
+
+Usage:
+    python debug_agent.py [--db brands.db] report [--hours 24] [--integrity]
+    python debug_agent.py brands
+    python debug_agent.py analyze | vacuum
+    python debug_agent.py compact [--keep-days 365] [--keep-per-brand 20]
+    python debug_agent.py purge-cache [--brand NAME | --below-confidence 0.5 | --all]
+    python debug_agent.py refresh --top 10 [--dry-run]
+    python debug_agent.py profile [--dir profiles] [--last 50] [--top 15]
 """
-import sqlite3
+import argparse
+import glob
 import os
+import sqlite3
+import sys
+from collections import Counter
+from datetime import datetime, timedelta
+
+import profiling
+import telemetry
+
+AGE_BUCKETS = [("< 7 days", 0, 7), ("7-30 days", 7, 30), ("30-90 days", 30, 90), ("> 90 days", 90, None)]
+
+
+def connect_read_only(db_path: str) -> sqlite3.Connection:
+    """Read-only connection that never takes the write lock and gives up quickly if busy"""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=2)
+    conn.execute("PRAGMA query_only = 1")
+    return conn
+
+
+def connect_read_write(db_path: str) -> sqlite3.Connection:
+    """Connection for maintenance commands; waits politely for the app's writer"""
+    return sqlite3.connect(db_path, timeout=30)
+
+
+def header(title: str):
+    print("\n" + "=" * 60)
+    print(title)
+    print("=" * 60)
+
+
+def section(title: str):
+    print(f"\n{title}")
+    print("-" * 60)
+
+
+def table_exists(cursor, name: str) -> bool:
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,))
+    return cursor.fetchone() is not None
+
+
+def report(db_path: str, hours: int, integrity: bool):
+    """DB size, row counts, freshness, caches, slow queries, token spend, index health"""
+    conn = connect_read_only(db_path)
+    cursor = conn.cursor()
+    since = (datetime.utcnow() - timedelta(hours=hours)).strftime("%Y-%m-%d %H:%M:%S")
+
+    header("ConsciousCart - Inspector Report")
+
+    section("💾 Storage")
+    for suffix in ("", "-wal", "-shm"):
+        path = db_path + suffix
+        if os.path.exists(path):
+            print(f"{os.path.basename(path):<28} {os.path.getsize(path) / 1024:>10.1f} KB")
+    cursor.execute("PRAGMA journal_mode")
+    print(f"{'journal mode':<28} {cursor.fetchone()[0]:>10}")
+
+    section("📊 Row counts")
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' "
+                   "AND name NOT LIKE '%_fts_%' ORDER BY name")
+    for (name,) in cursor.fetchall():
+        cursor.execute(f'SELECT COUNT(*) FROM "{name}"')
+        print(f"{name:<28} {cursor.fetchone()[0]:>10}")
+
+    section("🕒 Freshness (by age since last verification)")
+    print(f"{'age':<14} {'fresh':>8} {'stale':>8}")
+    for label, low, high in AGE_BUCKETS:
+        conditions = ["last_verified <= datetime('now', ?)"]
+        params = [f"-{low} days"]
+        if high is not None:
+            conditions.append("last_verified > datetime('now', ?)")
+            params.append(f"-{high} days")
+        cursor.execute(f"""
+            SELECT SUM(expires_at > CURRENT_TIMESTAMP), SUM(expires_at <= CURRENT_TIMESTAMP)
+            FROM brands
+            WHERE {" AND ".join(conditions)}
+        """, params)
+        fresh, stale = cursor.fetchone()
+        print(f"{label:<14} {fresh or 0:>8} {stale or 0:>8}")
+
+    if table_exists(cursor, "query_log"):
+        section(f"⚡ Caches (last {hours}h)")
+        ratios = telemetry.cache_ratios(cursor, since)
+        if not ratios:
+            print("No cache activity recorded")
+        for name, stats in ratios.items():
+            print(f"{name:<16} hits {stats['hits']:>6}  misses {stats['misses']:>6}  "
+                  f"hit ratio {stats['hit_ratio']:>6.1%}  size {stats['size']:>6}")
+
+        section(f"💸 Token spend (last {hours}h)")
+        for key, value in telemetry.token_spend(cursor, since).items():
+            print(f"{key.replace('_', ' '):<28} {value:>10}")
+
+        section(f"🐢 Slowest queries (last {hours}h)")
+        for created_at, latency, handled_by, llm_calls, tool_calls, tokens, budget_hit, query in \
+                telemetry.slowest_queries(cursor, since):
+            budget_note = f" [budget: {budget_hit}]" if budget_hit else ""
+            print(f"{latency:>9.0f} ms  {handled_by:<5} llm={llm_calls} tools={tool_calls} "
+                  f"tokens={tokens or 0}  {query[:40]!r}{budget_note}")
+
+    section("🗂️ Index health")
+    analyzed = table_exists(cursor, "sqlite_stat1")
+    print(f"Planner statistics (ANALYZE): {'present' if analyzed else 'missing - run: analyze'}")
+    cursor.execute("SELECT name, tbl_name FROM sqlite_master WHERE type = 'index' ORDER BY tbl_name, name")
+    for name, table in cursor.fetchall():
+        stat = ""
+        if analyzed:
+            cursor.execute("SELECT stat FROM sqlite_stat1 WHERE idx = ?", (name,))
+            row = cursor.fetchone()
+            stat = f"  stat: {row[0]}" if row else "  stat: none"
+        print(f"{table:<16} {name:<40}{stat}")
+    if integrity:
+        cursor.execute("PRAGMA quick_check")
+        print(f"quick_check: {', '.join(row[0] for row in cursor.fetchall())}")
+
+    conn.close()
+    print("\n" + "=" * 60 + "\n")
 
-print("\n" + "="*60)
-print("ConsciousCart - Debug Info")
-print("="*60)
 
-# Check database
-db_path = "brands.db"
-if os.path.exists(db_path):
-    print(f"\n✅ Database found: {db_path}")
-    
-    conn = sqlite3.connect(db_path)
+def list_brands(db_path: str):
+    """All brands, most recently verified first"""
+    conn = connect_read_only(db_path)
     cursor = conn.cursor()
-    
-    # Show brands
+
     cursor.execute("SELECT COUNT(*) FROM brands")
-    count = cursor.fetchone()[0]
-    print(f"\n📊 Total brands in database: {count}")
-    
-    # Show all brands
+    print(f"\n📊 Total brands in database: {cursor.fetchone()[0]}")
+
     cursor.execute("""
-        SELECT name, is_cruelty_free, parent_company, last_verified 
-        FROM brands 
+        SELECT name, is_cruelty_free, parent_company, confidence, expires_at <= CURRENT_TIMESTAMP
+        FROM brands
         ORDER BY last_verified DESC
     """)
-    
+
     print("\n🔍 Brands in database:")
     print("-" * 60)
-    for row in cursor.fetchall():
-        name, is_cf, parent, verified = row
+    for name, is_cf, parent, confidence, is_stale in cursor.fetchall():
         status = "✅ Cruelty-Free" if is_cf else "❌ Not CF"
         parent_info = f" (Parent: {parent})" if parent else ""
-        print(f"{status:<20} {name:<20}{parent_info}")
-    
+        stale_info = " [stale]" if is_stale else ""
+        print(f"{status:<20} {name:<20} {confidence or 0:.2f}{parent_info}{stale_info}")
+
+    conn.close()
+
+
+def maintenance(db_path: str, command: str):
+    """ANALYZE is cheap; VACUUM rewrites the file and holds the write lock while it runs"""
+    conn = connect_read_write(db_path)
+    if command == "vacuum":
+        print("VACUUM holds the write lock until it finishes; saves queue up meanwhile.")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("VACUUM")
+    else:
+        conn.execute("ANALYZE")
+        conn.commit()
     conn.close()
-else:
-    print(f"\n❌ Database not found: {db_path}")
-    print("Run the app first to create the database")
-
-print("\n" + "="*60)
-print("To view user preferences, they are stored in session state")
-print("Check the Streamlit app's sidebar for real-time profile")
-print("="*60 + "\n")
\ No newline at end of file
+    print(f"✅ {command} complete")
+
+
+def compact_verifications(db_path: str, keep_days: int, keep_per_brand: int):
+    """Retention: drop log entries older than keep_days beyond each brand's newest keep_per_brand"""
+    conn = connect_read_write(db_path)
+    cursor = conn.cursor()
+    cursor.execute("""
+        DELETE FROM verifications
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, verified_at,
+                       ROW_NUMBER() OVER (PARTITION BY brand_id ORDER BY verified_at DESC, id DESC) AS newest
+                FROM verifications
+            )
+            WHERE newest > ? AND verified_at < datetime('now', ?)
+        )
+    """, (keep_per_brand, f"-{keep_days} days"))
+    conn.commit()
+    print(f"✅ Compacted {cursor.rowcount} old verification entries")
+    conn.close()
+
+
+def purge_cache(db_path: str, brand: str, below_confidence: float, purge_all: bool):
+    """Expire cached verifications so the next query re-verifies them"""
+    if brand:
+        where, params = "LOWER(name) = LOWER(?)", [brand]
+    elif below_confidence is not None:
+        where, params = "confidence < ?", [below_confidence]
+    elif purge_all:
+        where, params = "1 = 1", []
+    else:
+        print("Nothing to purge: pass --brand, --below-confidence or --all")
+        return
+
+    conn = connect_read_write(db_path)
+    cursor = conn.cursor()
+    cursor.execute(f"UPDATE brands SET expires_at = CURRENT_TIMESTAMP, version = version + 1 WHERE {where}", params)
+    conn.commit()
+    print(f"✅ Marked {cursor.rowcount} brand(s) stale")
+    conn.close()
+
+
+def hottest_stale_brands(db_path: str, top: int) -> list:
+    """Stale brands ordered by how often they came up in the last 30 days"""
+    conn = connect_read_only(db_path)
+    cursor = conn.cursor()
+    since = (datetime.utcnow() - timedelta(days=30)).strftime("%Y-%m-%d %H:%M:%S")
+    heat = telemetry.hottest_brands(cursor, since) if table_exists(cursor, "query_log") else {}
+
+    cursor.execute("SELECT name FROM brands WHERE expires_at <= CURRENT_TIMESTAMP")
+    stale = [name for (name,) in cursor.fetchall()]
+    conn.close()
+
+    stale.sort(key=lambda name: heat.get(name.lower(), 0), reverse=True)
+    return [(name, heat.get(name.lower(), 0)) for name in stale[:top]]
+
+
+def refresh(db_path: str, top: int, dry_run: bool):
+    """Re-verify the top-N hottest stale brands"""
+    targets = hottest_stale_brands(db_path, top)
+    if not targets:
+        print("✅ No stale brands")
+        return
+
+    for name, mentions in targets:
+        print(f"🔄 {name} ({mentions} recent mentions)")
+    if dry_run:
+        return
+
+    from agent import ConsciousCartAgent
+
+    agent = ConsciousCartAgent(db_path=db_path)
+    for name, _ in targets:
+        result = agent.reverify_brand(name)
+        print(f"   {name}: {'saved' if result.get('success') else result.get('error')}")
+    if agent.writer:
+        agent.writer.flush()
+
+
+def profile_summary(profile_dir: str, last: int, top: int):
+    """Hot functions across the most recent per-request profiles"""
+    paths = sorted(glob.glob(os.path.join(profile_dir, "*.collapsed")))[-last:]
+    if not paths:
+        print(f"No profiles in {profile_dir} (set CC_PROFILE_SAMPLE_RATE or call process_query(profile=True))")
+        return
+
+    stacks = sum((profiling.read_collapsed(path) for path in paths), Counter())
+    interval_ms = float(os.getenv("CC_PROFILE_INTERVAL_MS", 5))
+    header(f"🔥 Hot functions ({len(paths)} profiled requests, {sum(stacks.values())} samples)")
+    print(f"{'function':<48} {'self ms':>9} {'self %':>7} {'total %':>8}")
+    for row in profiling.hot_functions(stacks, interval_ms, top):
+        print(f"{row['function'][:48]:<48} {row['self_ms']:>9.0f} {row['self_pct']:>7.1f} {row['total_pct']:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect and maintain the ConsciousCart database")
+    parser.add_argument("--db", default="brands.db", help="path to brands.db")
+    commands = parser.add_subparsers(dest="command")
+
+    report_parser = commands.add_parser("report", help="read-only health report (default)")
+    report_parser.add_argument("--hours", type=int, default=24, help="telemetry window")
+    report_parser.add_argument("--integrity", action="store_true", help="also run PRAGMA quick_check")
+
+    commands.add_parser("brands", help="list brands")
+    commands.add_parser("analyze", help="refresh planner statistics")
+    commands.add_parser("vacuum", help="rebuild the database file")
+
+    compact_parser = commands.add_parser("compact", help="apply verification log retention")
+    compact_parser.add_argument("--keep-days", type=int, default=365)
+    compact_parser.add_argument("--keep-per-brand", type=int, default=20)
+
+    purge_parser = commands.add_parser("purge-cache", help="expire cached verifications")
+    purge_parser.add_argument("--brand")
+    purge_parser.add_argument("--below-confidence", type=float)
+    purge_parser.add_argument("--all", action="store_true")
+
+    refresh_parser = commands.add_parser("refresh", help="re-verify the hottest stale brands")
+    refresh_parser.add_argument("--top", type=int, default=10)
+    refresh_parser.add_argument("--dry-run", action="store_true")
+
+    profile_parser = commands.add_parser("profile", help="summarize per-request profiles")
+    profile_parser.add_argument("--dir", default=os.getenv("CC_PROFILE_DIR", "profiles"))
+    profile_parser.add_argument("--last", type=int, default=50, help="most recent N profiles")
+    profile_parser.add_argument("--top", type=int, default=15)
+
+    args = parser.parse_args()
+
+    # Profiles live on disk; no database needed
+    if args.command == "profile":
+        profile_summary(args.dir, args.last, args.top)
+        sys.exit(0)
+
+    if not os.path.exists(args.db):
+        print(f"\n❌ Database not found: {args.db}")
+        print("Run the app first to create the database")
+        sys.exit(1)
+
+    if args.command in (None, "report"):
+        report(args.db, getattr(args, "hours", 24), getattr(args, "integrity", False))
+    elif args.command == "brands":
+        list_brands(args.db)
+    elif args.command in ("analyze", "vacuum"):
+        maintenance(args.db, args.command)
+    elif args.command == "compact":
+        compact_verifications(args.db, args.keep_days, args.keep_per_brand)
+    elif args.command == "purge-cache":
+        purge_cache(args.db, args.brand, args.below_confidence, args.all)
+    elif args.command == "refresh":
+        refresh(args.db, args.top, args.dry_run)
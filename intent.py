@@ -0,0 +1,93 @@
+"""
+ConsciousCart - Local Feedback Intent Classifier
+Recognizes pure preference updates ("too expensive", "I want vegan") without an LLM call
+"""
+import re
+
+# intent -> phrases; each intent compiles to one regex automaton
+FEEDBACK_INTENTS = {
+    "budget_down": ["too expensive", "expensive", "too much", "pricey", "overpriced", "cheaper",
+                    "costs too much", "out of my budget", "out of budget", "over my budget"],
+    "budget_ok": ["cheap", "affordable", "budget friendly", "budget-friendly", "good price", "budget"],
+    "vegan": ["vegan", "plant based", "plant-based", "no animal ingredients"],
+    "fragrance_free": ["fragrance free", "fragrance-free", "fragrance", "unscented", "no scent", "scent"],
+    "paraben_free": ["paraben free", "paraben-free", "parabens", "paraben", "no parabens"],
+    "positive": ["perfect", "love it", "love", "great", "good", "thanks", "thank you", "awesome", "nice"],
+    "negative": ["hate", "don't like", "dont like", "not for me", "bad", "no thanks"]
+}
+
+# Words that carry no request of their own in a feedback turn
+FILLER_WORDS = {
+    "i", "im", "i'm", "me", "my", "it", "its", "it's", "that", "that's", "thats", "this", "is",
+    "was", "a", "an", "the", "bit", "little", "too", "so", "very", "really", "just", "only",
+    "want", "need", "prefer", "like", "would", "something", "products", "product", "stuff",
+    "please", "pls", "and", "also", "but", "oh", "ok", "okay", "hmm", "yes", "yeah",
+    "one", "ones", "options", "more", "much", "for", "of", "to", "be", "should", "must"
+}
+
+# Signs the turn asks something the LLM has to answer
+QUESTION_PATTERN = re.compile(
+    r"\?|^\s*(?:is|are|does|do|what|which|who|where|why|how|can|could|should|will|find|show|recommend|check)\b",
+    re.IGNORECASE
+)
+_WORD_PATTERN = re.compile(r"[a-z][a-z'\-]*", re.IGNORECASE)
+
+# Preference intents a negator turns around; positive/negative phrases carry their own polarity
+NEGATABLE_INTENTS = {"budget_down", "budget_ok", "vegan", "fragrance_free", "paraben_free"}
+
+# A negator up to two words before a phrase ("no vegan", "not too expensive", "don't need vegan")
+_NEGATED_PATTERN = re.compile(
+    r"\b(?:no|not|non|don't|dont|do not|without|never)\s+(?:[a-z'\-]+\s+){0,2}$", re.IGNORECASE
+)
+
+
+class FeedbackIntent:
+    """Classification of one user turn"""
+
+    def __init__(self, intents: set, confidence: float, is_question: bool, negated: set = None):
+        self.intents = intents
+        self.confidence = confidence
+        self.is_question = is_question
+        self.negated = negated or set()  # intents the user turned down ("no vegan please")
+
+    def is_pure_feedback(self, threshold: float) -> bool:
+        """True when the turn only updates preferences and can be handled locally"""
+        return bool(self.intents) and not self.is_question and not self.negated and self.confidence >= threshold
+
+
+class FeedbackClassifier:
+    """Keyword-automaton classifier with a coverage-based confidence score"""
+
+    def __init__(self, threshold: float = 0.85):
+        self.threshold = threshold
+        # Longest phrases first so "too expensive" wins over "expensive"
+        self.patterns = {
+            intent: re.compile(
+                r"\b(?:" + "|".join(re.escape(p) for p in sorted(phrases, key=len, reverse=True)) + r")\b",
+                re.IGNORECASE
+            )
+            for intent, phrases in FEEDBACK_INTENTS.items()
+        }
+
+    def classify(self, text: str) -> FeedbackIntent:
+        """Score how much of the turn is explained by feedback phrases and filler"""
+        intents = set()
+        negated = set()
+        covered = [False] * len(text)
+        for intent, pattern in self.patterns.items():
+            for match in pattern.finditer(text):
+                intents.add(intent)
+                if intent in NEGATABLE_INTENTS and _NEGATED_PATTERN.search(text[:match.start()]):
+                    negated.add(intent)
+                covered[match.start():match.end()] = [True] * (match.end() - match.start())
+
+        total_chars = 0
+        explained_chars = 0
+        for match in _WORD_PATTERN.finditer(text):
+            length = match.end() - match.start()
+            total_chars += length
+            if all(covered[match.start():match.end()]) or match.group().lower() in FILLER_WORDS:
+                explained_chars += length
+
+        confidence = explained_chars / total_chars if total_chars else 0.0
+        return FeedbackIntent(intents, confidence, bool(QUESTION_PATTERN.search(text)), negated)
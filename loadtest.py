@@ -0,0 +1,286 @@
+"""
+ConsciousCart - Concurrent Load Test
+Simulates N chat sessions against ConsciousCartAgent with a stub model client
+and reports throughput, latency percentiles, SQLite contention, memory per session
+and LLM scheduler queueing, optionally alongside saturating background re-verification
+
+Usage:
+    python loadtest.py --sessions 50 --queries 10 --output loadtest_results.json
+    python loadtest.py --sessions 20 --background-workers 16
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from types import SimpleNamespace
+
+os.environ.setdefault("ANTHROPIC_API_KEY", "loadtest-stub")
+
+from agent import ConsciousCartAgent
+
+KNOWN_BRANDS = [
+    "Maybelline", "Fenty Beauty", "e.l.f. Cosmetics", "MAC", "NYX", "Pacifica",
+    "CoverGirl", "Revlon", "Urban Decay", "Too Faced"
+]
+DB_TOOLS = ("_check_database", "_check_database_batch", "_search_database", "_find_alternatives", "_save_to_database")
+
+
+class StubModelClient:
+    """Stands in for Anthropic: check_database -> (web_search -> save_to_database) -> answer,
+    answering straight away when the brand's record was injected into the prompt and is fresh"""
+
+    def __init__(self, latency_ms: float, rng: random.Random):
+        self.latency = latency_ms / 1000
+        self.rng = rng
+        self.messages = self
+        self._ids = 0
+
+    def with_options(self, **options):
+        return self  # no retries to turn off
+
+    def _response(self, content: list, stop_reason: str):
+        return SimpleNamespace(
+            content=content,
+            stop_reason=stop_reason,
+            usage=SimpleNamespace(input_tokens=self.rng.randint(800, 1500), output_tokens=self.rng.randint(50, 300))
+        )
+
+    def _tool_use(self, name: str, tool_input: dict):
+        self._ids += 1
+        block = SimpleNamespace(type="tool_use", name=name, input=tool_input, id=f"stub_{self._ids}")
+        return self._response([block], "tool_use")
+
+    def _answer(self, text: str):
+        return self._response([SimpleNamespace(type="text", text=text)], "end_turn")
+
+    def create(self, **kwargs):
+        time.sleep(self.rng.expovariate(1 / self.latency) if self.latency else 0)
+
+        # Nested research call inside _web_search
+        if kwargs.get("tool_choice", {}).get("name") == "record_findings":
+            verdict = self.rng.choice(["cruelty_free", "not_cruelty_free"])
+            return self._tool_use("record_findings", {
+                "summary": "Stub research summary",
+                "findings": [
+                    {"source": "Leaping Bunny", "verdict": verdict, "date": "2025"},
+                    {"source": "PETA", "verdict": verdict, "date": "2024"}
+                ]
+            })
+
+        messages = kwargs["messages"]
+        last = messages[-1]
+        if isinstance(last["content"], str):
+            match = re.match(r"Is (.+) cruelty-free\?", last["content"])
+            if "DATABASE RESULTS FOR BRANDS" in kwargs["system"] and '"is_stale": false' in kwargs["system"]:
+                return self._answer(f"{match.group(1) if match else 'Brand'} checked.")
+            return self._tool_use("check_database", {"brand_name": match.group(1) if match else last["content"]})
+
+        previous_tool = next(b for b in messages[-2]["content"] if b.type == "tool_use")
+        result = json.loads(last["content"][0]["content"])
+        if previous_tool.name == "check_database":
+            if result.get("found") and not result.get("is_stale"):
+                return self._answer(f"{result['brand_name']} checked.")
+            return self._tool_use("web_search", {"query": f"{previous_tool.input['brand_name']} cruelty free"})
+        if previous_tool.name == "web_search":
+            brand = next(b for b in messages[-4]["content"] if b.type == "tool_use").input["brand_name"]
+            return self._tool_use("save_to_database", {
+                "brand_name": brand,
+                "is_cruelty_free": bool(result["assessment"]["is_cruelty_free"]),
+                "explanation": "Verified by load test stub",
+                "sources": ["Leaping Bunny", "PETA"]
+            })
+        return self._answer("Done.")
+
+
+class ContentionStats:
+    """Thread-safe timings of every database tool call"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.waits_ms = []
+        self.lock_errors = 0
+        self.other_errors = 0
+
+    def wrap(self, fn):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                with self.lock:
+                    self.waits_ms.append((time.perf_counter() - start) * 1000)
+                    if "locked" in str(e):
+                        self.lock_errors += 1
+                    else:
+                        self.other_errors += 1
+                raise
+            elapsed = (time.perf_counter() - start) * 1000
+            with self.lock:
+                self.waits_ms.append(elapsed)
+                # _save_to_database reports failures instead of raising
+                if isinstance(result, dict) and result.get("success") is False:
+                    if "locked" in result.get("error", ""):
+                        self.lock_errors += 1
+                    else:
+                        self.other_errors += 1
+            return result
+        return timed
+
+
+def percentiles(values: list) -> dict:
+    """Nearest-rank p50/p95/p99 plus mean and max, in the input's unit"""
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    ordered = sorted(values)
+
+    def rank(p):
+        return round(ordered[min(len(ordered) - 1, max(0, int(p / 100 * len(ordered) + 0.5) - 1))], 2)
+
+    return {"p50": rank(50), "p95": rank(95), "p99": rank(99),
+            "mean": round(sum(ordered) / len(ordered), 2), "max": round(ordered[-1], 2)}
+
+
+def zipf_brands(unknown_brands: int, s: float) -> tuple:
+    """Brand pool (known brands most popular) and Zipf weights 1/rank^s"""
+    pool = KNOWN_BRANDS + [f"Indie Brand {i:04d}" for i in range(unknown_brands)]
+    weights = [1 / (rank ** s) for rank in range(1, len(pool) + 1)]
+    return pool, weights
+
+
+def run_load_test(sessions: int = 20, queries: int = 10, think_time_ms: float = 200,
+                  model_latency_ms: float = 50, zipf_s: float = 1.1, unknown_brands: int = 200,
+                  db_path: str = "loadtest.db", seed: int = 42, background_workers: int = 0) -> dict:
+    """Run the simulation and return the report as a dict"""
+    rng = random.Random(seed)
+    pool, weights = zipf_brands(unknown_brands, zipf_s)
+    stats = ContentionStats()
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+
+    # Sessions are created up front, like Streamlit sessions already open
+    agents = []
+    for i in range(sessions):
+        agent = ConsciousCartAgent(db_path=db_path)
+        agent.client = StubModelClient(model_latency_ms, random.Random(seed + i))
+        for name in DB_TOOLS:
+            setattr(agent, name, stats.wrap(getattr(agent, name)))
+        agents.append(agent)
+    after_setup = tracemalloc.get_traced_memory()[0]
+
+    latencies_ms = []
+    errors = {}
+    results_lock = threading.Lock()
+
+    def session(agent, session_rng):
+        for _ in range(queries):
+            if think_time_ms:
+                time.sleep(session_rng.expovariate(1000 / think_time_ms))
+            brand = session_rng.choices(pool, weights)[0]
+            start = time.perf_counter()
+            try:
+                agent.process_query(f"Is {brand} cruelty-free?")
+                with results_lock:
+                    latencies_ms.append((time.perf_counter() - start) * 1000)
+            except Exception as e:
+                with results_lock:
+                    errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+
+    # Background re-verification competing for the same LLM capacity until the sessions finish
+    sessions_done = threading.Event()
+    background_done = []
+    
+    def background(worker_rng):
+        agent = ConsciousCartAgent(db_path=db_path)
+        agent.client = StubModelClient(model_latency_ms, worker_rng)
+        while not sessions_done.is_set():
+            agent.reverify_brand(worker_rng.choice(pool))
+            with results_lock:
+                background_done.append(1)
+    
+    background_threads = [
+        threading.Thread(target=background, args=(random.Random(seed * 1000 + i),), daemon=True)
+        for i in range(background_workers)
+    ]
+    threads = [
+        threading.Thread(target=session, args=(agent, random.Random(rng.random())), daemon=True)
+        for agent in agents
+    ]
+    started = time.perf_counter()
+    for thread in background_threads + threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    sessions_done.set()
+    for thread in background_threads:
+        thread.join()
+    # Queued saves count towards the run
+    writer = agents[0].writer if agents else None
+    if writer:
+        writer.flush()
+    wall_seconds = time.perf_counter() - started
+
+    after_run = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return {
+        "started_at": datetime.now().isoformat(),
+        "config": {
+            "sessions": sessions, "queries_per_session": queries, "think_time_ms": think_time_ms,
+            "model_latency_ms": model_latency_ms, "zipf_s": zipf_s, "unknown_brands": unknown_brands,
+            "db_path": db_path, "seed": seed, "background_workers": background_workers
+        },
+        "queries_completed": len(latencies_ms),
+        "errors": errors,
+        "wall_seconds": round(wall_seconds, 2),
+        "throughput_qps": round(len(latencies_ms) / wall_seconds, 2) if wall_seconds else None,
+        "latency_ms": percentiles(latencies_ms),
+        "background_reverifications": len(background_done),
+        "llm_scheduler": agents[0].scheduler.stats() if agents else None,
+        "sqlite": {
+            "db_calls": len(stats.waits_ms),
+            "lock_errors": stats.lock_errors,
+            "other_errors": stats.other_errors,
+            "call_ms": percentiles(stats.waits_ms),
+            "write_behind": dict(writer.stats) if writer else None
+        },
+        "memory_kb": {
+            "per_session_setup": round((after_setup - baseline) / 1024 / max(sessions, 1), 1),
+            "growth_per_session": round((after_run - after_setup) / 1024 / max(sessions, 1), 1)
+        }
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent load test for ConsciousCartAgent")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=10, help="queries per session")
+    parser.add_argument("--think-time-ms", type=float, default=200, help="mean think time between queries")
+    parser.add_argument("--model-latency-ms", type=float, default=50, help="mean stub model latency")
+    parser.add_argument("--zipf-s", type=float, default=1.1, help="brand popularity skew")
+    parser.add_argument("--unknown-brands", type=int, default=200, help="brands not in the seed data")
+    parser.add_argument("--db", default="loadtest.db")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--background-workers", type=int, default=0,
+                        help="threads re-verifying brands at background priority during the run")
+    parser.add_argument("--output", default="loadtest_results.json")
+    args = parser.parse_args()
+
+    report = run_load_test(
+        sessions=args.sessions, queries=args.queries, think_time_ms=args.think_time_ms,
+        model_latency_ms=args.model_latency_ms, zipf_s=args.zipf_s,
+        unknown_brands=args.unknown_brands, db_path=args.db, seed=args.seed,
+        background_workers=args.background_workers
+    )
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(json.dumps(report, indent=2))
+    print(f"\nResults written to {args.output}")
@@ -0,0 +1,93 @@
+"""
+ConsciousCart - Negative Cache
+Remembers brands that were searched and came back with no reliable information, so a
+repeated typo or unknown brand doesn't pay for another round of web searches
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from brand_names import normalize_brand_name
+
+# "Is Foo cruelty-free?" / "Does Foo test on animals?" -> "Foo"
+BRAND_QUESTION_PATTERN = re.compile(
+    r"^\s*(?:is|are|does|do)\s+(?P<brand>.+?)\s+"
+    r"(?:cruelty[\s-]*free|vegan|tested\s+on\s+animals|tests?\s+on\s+animals)\s*\??\s*$",
+    re.IGNORECASE
+)
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def brand_from_question(user_query: str):
+    """Brand named in a plain status question, or None"""
+    match = BRAND_QUESTION_PATTERN.match(user_query)
+    return match.group("brand").strip(" \"'") if match else None
+
+
+class NegativeCache:
+    """Bounded LRU of inconclusive lookups with a short TTL, kept apart from the brand caches"""
+
+    def __init__(self, ttl_seconds: float = 900, max_entries: int = 1000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._entries = OrderedDict()  # normalized name -> (entry, expires_at)
+        self._lock = threading.Lock()
+
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0}
+
+    def size(self) -> int:
+        """Number of entries, expired ones included until they are looked up or evicted"""
+        return len(self._entries)
+
+    def get(self, brand_name: str):
+        """Cached "nothing found" entry for a brand, or None (counts hits and misses)"""
+        key = normalize_brand_name(brand_name)
+        now = time.monotonic()
+        with self._lock:
+            item = self._entries.get(key)
+            if item and item[1] > now:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                entry = dict(item[0])
+                entry["searched_seconds_ago"] = round(now - entry.pop("stored_at"))
+                return entry
+            self._entries.pop(key, None)
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, brand_name: str, query: str, reason: str):
+        """Remember that a search for a brand settled nothing"""
+        key = normalize_brand_name(brand_name)
+        if not key:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = (
+                {"brand_name": brand_name, "query": query, "reason": reason, "stored_at": now},
+                now + self.ttl_seconds
+            )
+            self._entries.move_to_end(key)
+            self.stats["stored"] += 1
+            # Oldest entries go first, so a flood of junk names can't grow the cache
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evicted"] += 1
+
+    def discard(self, brand_name: str):
+        """Forget a brand (e.g. once it has been saved)"""
+        with self._lock:
+            self._entries.pop(normalize_brand_name(brand_name), None)
+
+
+def get_negative_cache(db_path: str, ttl_seconds: float = 900, max_entries: int = 1000) -> NegativeCache:
+    """Process-wide negative cache per database file, shared by every agent session"""
+    with _caches_lock:
+        cache = _caches.get(db_path)
+        if cache is None:
+            cache = NegativeCache(ttl_seconds, max_entries)
+            _caches[db_path] = cache
+        return cache
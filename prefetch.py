@@ -0,0 +1,200 @@
+"""
+ConsciousCart - Speculative Prefetch
+After a brand turn, warms the data the usual follow-ups need (parent company,
+vegan status, category alternatives) so the next turn's tools answer from cache.
+Caches are per session; the worker threads and the live-search budget are per process,
+so speculative load doesn't grow with the number of sessions
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import scheduler
+from brand_names import normalize_brand_name
+
+# Words that mean the next turn is still about the same brand
+FOLLOW_UP_WORDS = {
+    "it", "its", "it's", "they", "them", "their", "this", "that", "brand", "parent", "owner",
+    "owned", "company", "vegan", "alternative", "alternatives", "instead", "similar", "cheaper",
+    "else", "other", "options", "recommend", "dupe", "dupes"
+}
+
+_executor = None
+_web_search_budget = None
+_shared_lock = threading.Lock()
+
+
+class HourlyBudget:
+    """Sliding one-hour window of started actions"""
+
+    def __init__(self, max_per_hour: int):
+        self.max_per_hour = max_per_hour
+        self._times = []
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        """Take one action from the budget; False when the last hour used it up"""
+        now = time.monotonic()
+        with self._lock:
+            self._times = [t for t in self._times if now - t < 3600]
+            if len(self._times) >= self.max_per_hour:
+                return False
+            self._times.append(now)
+            return True
+
+
+def get_executor(max_workers: int = 2) -> ThreadPoolExecutor:
+    """Process-wide prefetch workers shared by every agent session"""
+    global _executor
+    with _shared_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        return _executor
+
+
+def get_web_search_budget(max_per_hour: int = 10) -> HourlyBudget:
+    """Process-wide hourly budget for speculative live searches, shared by every agent session"""
+    global _web_search_budget
+    with _shared_lock:
+        if _web_search_budget is None:
+            _web_search_budget = HourlyBudget(max_per_hour)
+        return _web_search_budget
+
+
+class Prefetcher:
+    """Per-session prefetch cache with a per-turn task budget; workers and web-search budget are shared"""
+
+    def __init__(self, agent, max_tasks_per_turn: int = 3, max_web_searches_per_hour: int = 10,
+                 ttl_seconds: float = 600):
+        self.agent = agent
+        self.max_tasks_per_turn = max_tasks_per_turn
+        self.ttl_seconds = ttl_seconds
+
+        self._executor = get_executor()
+        self._web_search_budget = get_web_search_budget(max_web_searches_per_hour)
+        self._lock = threading.Lock()
+        self._cache = {}  # key -> (value, expires_at, served)
+        self._futures = []
+        self._generation = 0
+        self.topic_brand = None
+
+        self.stats = {"scheduled": 0, "prefetched": 0, "hits": 0, "misses": 0, "cancelled": 0, "skipped_budget": 0}
+
+    # Cache -----------------------------------------------------------------
+
+    def get(self, key: tuple):
+        """Prefetched value for a key, or None (counts hits and misses)"""
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry and entry[1] > time.monotonic():
+                value, expires_at, _ = entry
+                self._cache[key] = (value, expires_at, True)
+                self.stats["hits"] += 1
+                return value
+            self._cache.pop(key, None)
+            self.stats["misses"] += 1
+            return None
+
+    def match_web_search(self, query: str):
+        """A prefetched web search whose brand and topic both appear in the model's query"""
+        query_norm = normalize_brand_name(query)
+        with self._lock:
+            for key in self._cache:
+                if key[0] == "web_search" and key[1] in query_norm and key[2] in query_norm:
+                    break
+            else:
+                return None
+        return self.get(key)
+
+    def invalidate(self, key: tuple):
+        """Drop a cached entry (e.g. after the brand is saved)"""
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def _store(self, generation: int, key: tuple, value):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._cache[key] = (value, time.monotonic() + self.ttl_seconds, False)
+            self.stats["prefetched"] += 1
+
+    def hit_rate(self) -> float:
+        """Share of prefetched entries that a later turn actually used"""
+        return self.stats["hits"] / self.stats["prefetched"] if self.stats["prefetched"] else 0.0
+
+    # Scheduling ------------------------------------------------------------
+
+    def is_follow_up(self, user_query: str) -> bool:
+        """Whether a new turn continues the current topic"""
+        if not self.topic_brand:
+            return False
+        query_norm = normalize_brand_name(user_query)
+        return normalize_brand_name(self.topic_brand) in query_norm or bool(FOLLOW_UP_WORDS & set(query_norm.split()))
+
+    def cancel(self):
+        """Topic changed: stop queued work and ignore results still in flight"""
+        with self._lock:
+            self._generation += 1
+            pending = [f for f in self._futures if f.cancel()]
+            self.stats["cancelled"] += len(pending)
+            self._futures = []
+            self.topic_brand = None
+
+    def schedule(self, brand: str, product_type: str = None):
+        """Queue prefetch tasks for a brand the user just asked about"""
+        self.cancel()
+        with self._lock:
+            self.topic_brand = brand
+            generation = self._generation
+
+        tasks = [self._prefetch_parent, self._prefetch_vegan]
+        if product_type:
+            tasks.append(lambda gen, b: self._prefetch_alternatives(gen, product_type))
+
+        for task in tasks[:self.max_tasks_per_turn]:
+            future = self._executor.submit(self._run, task, generation, brand)
+            with self._lock:
+                self._futures.append(future)
+            self.stats["scheduled"] += 1
+
+    def _run(self, task, generation: int, brand: str):
+        if generation != self._generation:
+            return
+        try:
+            # Speculative work only gets LLM capacity that chat turns aren't using
+            with scheduler.priority("background"):
+                task(generation, brand)
+        except Exception as e:
+            print(f"[Prefetch] {getattr(task, '__name__', 'task')} failed for {brand}: {e}")
+
+    def _web_search_allowed(self) -> bool:
+        """Process-wide hourly budget for live searches started speculatively"""
+        if self._web_search_budget.try_acquire():
+            return True
+        with self._lock:
+            self.stats["skipped_budget"] += 1
+        return False
+
+    # Tasks -----------------------------------------------------------------
+
+    def _prefetch_parent(self, generation: int, brand: str):
+        record = self.agent._check_database(brand)
+        self._store(generation, ("check_database", normalize_brand_name(brand)), record)
+
+        parent = record.get("parent_company")
+        if parent:
+            self._store(generation, ("check_database", normalize_brand_name(parent)),
+                        self.agent._check_database(parent))
+
+    def _prefetch_vegan(self, generation: int, brand: str):
+        # Only a live search can settle vegan status for most brands
+        if not self._web_search_allowed():
+            return
+        result = self.agent._web_search(f"Is {brand} vegan?")
+        self._store(generation, ("web_search", normalize_brand_name(brand), "vegan"), result)
+
+    def _prefetch_alternatives(self, generation: int, product_type: str):
+        category = self.agent._normalize_category(product_type)
+        constraints = self.agent.user_profile.get_constraints_for_agent()
+        self._store(generation, ("find_alternatives", category, constraints),
+                    self.agent._query_alternatives(category))
@@ -0,0 +1,205 @@
+"""
+ConsciousCart - Request Profiling
+Wall-clock sampling profiler switched on per request or by sampling rate: a background
+thread samples the request thread's stack every few milliseconds (time blocked in the SDK
+included), writes the samples as collapsed stacks (flamegraph.pl / speedscope input), one
+file per request, and folds them into a rolling hot-function summary. Unprofiled requests
+pay one random() call.
+"""
+import contextvars
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from contextlib import contextmanager
+
+# Profile session of the request running in this context (None: not profiled)
+_current_session = contextvars.ContextVar("cc_profile_session", default=None)
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+
+class _NoopSession:
+    """Stand-in context manager when the current request isn't profiled"""
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NOOP_SESSION = _NoopSession()
+
+
+def _frame_label(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def hot_functions(stacks: Counter, interval_ms: float, top: int = 15) -> list:
+    """Functions by self time (leaf samples), with inclusive time (anywhere on the stack)"""
+    total = sum(stacks.values()) or 1
+    self_samples = Counter()
+    inclusive_samples = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        self_samples[frames[-1]] += count
+        for frame in set(frames):
+            inclusive_samples[frame] += count
+    return [
+        {
+            "function": function,
+            "self_ms": round(count * interval_ms, 1),
+            "self_pct": round(count / total * 100, 1),
+            "total_pct": round(inclusive_samples[function] / total * 100, 1)
+        }
+        for function, count in self_samples.most_common(top)
+    ]
+
+
+def read_collapsed(path: str) -> Counter:
+    """Samples of a collapsed-stack file ("frame;frame;frame count" per line)"""
+    stacks = Counter()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            if stack:
+                stacks[stack] += int(count)
+    return stacks
+
+
+class ProfileSession:
+    """Samples one request thread from __enter__ to __exit__"""
+
+    def __init__(self, profiler, name: str):
+        self.profiler = profiler
+        self.name = name
+        self.request_id = None
+        self.labels = []  # (name, frame that entered the label)
+        self.stacks = Counter()
+        self.path = None
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        self.thread_id = threading.get_ident()
+        # Frames above the `with` (Streamlit, test harness) are cut from every sample
+        self._entry = sys._getframe(1)
+        self._token = _current_session.set(self)
+        self.started = time.perf_counter()
+        self._sampler = threading.Thread(target=self._sample, name="profiler", daemon=True)
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._sampler.join()
+        self.duration_ms = (time.perf_counter() - self.started) * 1000
+        _current_session.reset(self._token)
+        self.profiler._finish(self)
+        return False
+
+    def _sample(self):
+        interval = self.profiler.interval_ms / 1000
+        while not self._stop.wait(interval):
+            frame = sys._current_frames().get(self.thread_id)
+            marks = {id(entered): name for name, entered in self.labels[:]}
+            frames = []
+            while frame is not None and frame is not self._entry:
+                if id(frame) in marks:
+                    frames.append(marks[id(frame)])
+                frames.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if frame is None:
+                continue  # sampled between __enter__ and the first call; nothing of ours yet
+            frames.append(self.name)
+            self.stacks[";".join(reversed(frames))] += 1
+
+    def summary(self, top: int = 10) -> dict:
+        return {
+            "request_id": self.request_id,
+            "path": self.path,
+            "samples": sum(self.stacks.values()),
+            "duration_ms": round(self.duration_ms, 1),
+            "hot": hot_functions(self.stacks, self.profiler.interval_ms, top)
+        }
+
+
+class Profiler:
+    """Decides which requests to profile, writes their stacks and keeps the rolling summary"""
+
+    def __init__(self, sample_rate: float = 0.0, interval_ms: float = 5.0,
+                 output_dir: str = "profiles", history: int = 50):
+        self.sample_rate = sample_rate
+        self.interval_ms = interval_ms
+        self.output_dir = output_dir
+
+        self._recent = deque(maxlen=history)  # stacks of the last N profiled requests
+        self._lock = threading.Lock()
+
+    def profile(self, name: str, force: bool = None):
+        """Context manager profiling the enclosed request; force=True/False overrides sampling"""
+        if force is False or (not force and (self.sample_rate <= 0 or random.random() >= self.sample_rate)):
+            return NOOP_SESSION
+        if _current_session.get() is not None:
+            return NOOP_SESSION  # already inside a profiled request
+        return ProfileSession(self, name)
+
+    def _finish(self, session: ProfileSession):
+        if not session.stacks:
+            return  # finished inside one sampling interval
+        with self._lock:
+            self._recent.append(session.stacks)
+        if not self.output_dir:
+            return
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            stamp = time.strftime("%Y%m%d-%H%M%S")
+            path = os.path.join(self.output_dir, f"{stamp}-{session.request_id or uuid.uuid4().hex[:16]}.collapsed")
+            with open(path, "w", encoding="utf-8") as f:
+                for stack, count in session.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            session.path = path
+        except OSError as e:
+            print(f"[Profiling] Export failed: {e}")
+
+    def hot_functions(self, top: int = 15) -> list:
+        """Hottest functions across the last N profiled requests"""
+        with self._lock:
+            stacks = sum(self._recent, Counter())
+        return hot_functions(stacks, self.interval_ms, top)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"profiled_requests": len(self._recent), "sample_rate": self.sample_rate}
+
+
+@contextmanager
+def label(name: str):
+    """Mark the enclosed work (a tool call) as its own frame in the current profile"""
+    session = _current_session.get()
+    if session is None:
+        yield
+        return
+    # Frame of the caller's `with` (ours -> contextlib __enter__ -> caller)
+    session.labels.append((name, sys._getframe(2)))
+    try:
+        yield
+    finally:
+        session.labels.pop()
+
+
+def get_profiler() -> Profiler:
+    """Process-wide profiler shared by every agent session (settings via CC_PROFILE_* env vars)"""
+    global _profiler
+    with _profiler_lock:
+        if _profiler is None:
+            _profiler = Profiler(
+                sample_rate=float(os.getenv("CC_PROFILE_SAMPLE_RATE", 0)),
+                interval_ms=float(os.getenv("CC_PROFILE_INTERVAL_MS", 5)),
+                output_dir=os.getenv("CC_PROFILE_DIR", "profiles")
+            )
+        return _profiler
@@ -0,0 +1,151 @@
+"""
+ConsciousCart - Bulk Rescoring
+Recomputes confidence for every row of brands.db with the current scoring rules
+(CONFIDENCE_STEPS, CONFLICT_PENALTY in agent.py) as NumPy column operations, so a scoring
+change reaches existing rows in seconds; also the scorer batch_verify.py uses per batch
+
+Usage:
+    python rescore.py [--db brands.db] --dry-run [--show 20]
+    python rescore.py [--db brands.db] [--chunk-size 5000]
+"""
+import argparse
+import sqlite3
+import time
+from collections import Counter
+
+import numpy as np
+
+from agent import (BASE_CONFIDENCE, CONFIDENCE_LABELS, CONFIDENCE_STEPS, CONFLICT_PENALTY,
+                   verification_ttl_days)
+
+RESCORE_SQL = """
+    UPDATE brands
+    SET confidence = :confidence,
+        -- A lower score can only bring re-verification forward; purged rows stay stale
+        expires_at = MIN(COALESCE(expires_at, datetime(last_verified, :ttl)), datetime(last_verified, :ttl)),
+        version = version + 1
+    WHERE id = :id
+"""
+
+
+def score_confidence(sources_count: np.ndarray, has_conflicts: np.ndarray) -> np.ndarray:
+    """VerificationResult.calculate_confidence over whole columns"""
+    sources_count = np.asarray(sources_count)
+    base = np.select(
+        [sources_count >= minimum for minimum, _ in CONFIDENCE_STEPS],
+        [confidence for _, confidence in CONFIDENCE_STEPS],
+        default=BASE_CONFIDENCE
+    )
+    base = base - np.where(np.asarray(has_conflicts, dtype=bool), CONFLICT_PENALTY, 0.0)
+    return np.clip(base, 0.1, 1.0)
+
+
+def confidence_labels(confidence: np.ndarray) -> np.ndarray:
+    """VerificationResult.get_confidence_label over a column ("Low" for missing scores)"""
+    confidence = np.nan_to_num(np.asarray(confidence, dtype=float), nan=-1.0)
+    return np.select(
+        [confidence >= minimum for minimum, _ in CONFIDENCE_LABELS],
+        [label for _, label in CONFIDENCE_LABELS],
+        default="Low"
+    )
+
+
+def ttl_days(confidence: np.ndarray, has_conflicts: np.ndarray) -> np.ndarray:
+    """verification_ttl_days per row, evaluated once per distinct (confidence, conflict) pair"""
+    days = np.empty(len(confidence), dtype=int)
+    for flag in (False, True):
+        mask = has_conflicts == flag
+        values, inverse = np.unique(confidence[mask], return_inverse=True)
+        days[mask] = np.array([verification_ttl_days(value, flag) for value in values], dtype=int)[inverse]
+    return days
+
+
+def load_scoring_inputs(db_path: str) -> dict:
+    """The brands table's scoring columns as arrays, one entry per row"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, name, COALESCE(sources_count, 0), COALESCE(has_conflicts, 0), confidence FROM brands")
+    rows = cursor.fetchall()
+    conn.close()
+
+    ids, names, sources_count, has_conflicts, confidence = zip(*rows) if rows else ((),) * 5
+    return {
+        "id": np.array(ids, dtype=np.int64),
+        "name": np.array(names, dtype=object),
+        "sources_count": np.array(sources_count, dtype=np.int64),
+        "has_conflicts": np.array(has_conflicts, dtype=bool),
+        "confidence": np.array(confidence, dtype=float)  # NULL -> nan
+    }
+
+
+def rescore(db_path: str, dry_run: bool = False, chunk_size: int = 5000, show: int = 20) -> dict:
+    """Rescore every brand and write back the changed rows; dry_run only reports the diff"""
+    started = time.perf_counter()
+    columns = load_scoring_inputs(db_path)
+    new_confidence = score_confidence(columns["sources_count"], columns["has_conflicts"])
+    old_confidence = columns["confidence"]
+
+    changed = np.flatnonzero(~np.isclose(new_confidence, old_confidence))
+    old_labels = confidence_labels(old_confidence[changed])
+    new_labels = confidence_labels(new_confidence[changed])
+    transitions = Counter(
+        f"{old} -> {new}" for old, new in zip(old_labels, new_labels) if old != new
+    )
+
+    # Largest moves first in the sample
+    order = changed[np.argsort(-np.abs(np.nan_to_num(new_confidence[changed] - old_confidence[changed], nan=1.0)))]
+    report = {
+        "rows": len(columns["id"]),
+        "changed": len(changed),
+        "label_changes": dict(transitions.most_common()),
+        "mean_before": round(float(np.nanmean(old_confidence)), 4) if len(old_confidence) else None,
+        "mean_after": round(float(new_confidence.mean()), 4) if len(new_confidence) else None,
+        "sample": [
+            {"brand_name": columns["name"][i],
+             "before": None if np.isnan(old_confidence[i]) else round(float(old_confidence[i]), 4),
+             "after": round(float(new_confidence[i]), 4)}
+            for i in order[:show]
+        ],
+        "dry_run": dry_run
+    }
+
+    if not dry_run and len(changed):
+        days = ttl_days(new_confidence[changed], columns["has_conflicts"][changed])
+        params = [
+            {"id": int(brand_id), "confidence": float(confidence), "ttl": f"+{ttl} days"}
+            for brand_id, confidence, ttl in zip(columns["id"][changed], new_confidence[changed], days)
+        ]
+        conn = sqlite3.connect(db_path, timeout=30)
+        cursor = conn.cursor()
+        # Short transactions so the app's writer never waits long for the lock
+        for i in range(0, len(params), chunk_size):
+            cursor.executemany(RESCORE_SQL, params[i:i + chunk_size])
+            conn.commit()
+        conn.close()
+
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    return report
+
+
+def print_report(report: dict):
+    mode = "Dry run" if report["dry_run"] else "Rescored"
+    print(f"\n{mode}: {report['changed']} of {report['rows']} brands change confidence "
+          f"(mean {report['mean_before']} -> {report['mean_after']}, {report['seconds']}s)")
+    for transition, count in report["label_changes"].items():
+        print(f"   {transition:<24} {count:>8}")
+    if report["sample"]:
+        print(f"\n{'brand':<32} {'before':>8} {'after':>8}")
+        for row in report["sample"]:
+            before = "-" if row["before"] is None else f"{row['before']:.2f}"
+            print(f"{row['brand_name'][:32]:<32} {before:>8} {row['after']:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute brand confidence with the current scoring rules")
+    parser.add_argument("--db", default="brands.db", help="path to brands.db")
+    parser.add_argument("--dry-run", action="store_true", help="report the diff without writing")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="rows per write transaction")
+    parser.add_argument("--show", type=int, default=20, help="changed rows to list")
+    args = parser.parse_args()
+
+    print_report(rescore(args.db, args.dry_run, args.chunk_size, args.show))
@@ -0,0 +1,133 @@
+"""
+ConsciousCart - Response Cache
+Final answers memoized by normalized query text and profile constraints, valid only while
+every brand row the answer was built from is still at the version it was read at
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from brand_names import normalize_brand_name
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def cache_key(user_query: str, constraints: str) -> tuple:
+    """("is maybelline cruelty free", <constraints hash>) for every spelling of the same question"""
+    return normalize_brand_name(user_query), hashlib.sha1(constraints.encode("utf-8")).hexdigest()[:16]
+
+
+def brand_versions(db_path: str, brand_names: list) -> dict:
+    """Current version of each brand row that exists and is still fresh"""
+    if not brand_names:
+        return {}
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT name, version
+        FROM brands
+        WHERE name IN ({",".join("?" * len(brand_names))})
+          AND (expires_at IS NULL OR expires_at > CURRENT_TIMESTAMP)
+    """, list(brand_names))
+    versions = dict(cursor.fetchall())
+    conn.close()
+    return versions
+
+
+class ResponseCache:
+    """LRU of final answers with per-brand invalidation"""
+
+    def __init__(self, db_path: str, max_entries: int = 500, ttl_seconds: float = 3600):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._entries = OrderedDict()  # key -> entry
+        self._by_brand = {}  # brand name -> keys of answers built from it
+        self._lock = threading.Lock()
+
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "invalidated": 0, "evicted": 0}
+
+    def size(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: tuple):
+        """Cached entry if it's unexpired and its brands are unchanged in brands.db, else None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry["expires_at"] <= time.monotonic():
+                self._remove(key)
+                entry = None
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+
+        # The database is the source of truth: another process may have re-verified a brand
+        if brand_versions(self.db_path, list(entry["versions"])) != entry["versions"]:
+            with self._lock:
+                self._remove(key)
+            self.stats["invalidated"] += 1
+            self.stats["misses"] += 1
+            return None
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return entry
+
+    def put(self, key: tuple, brand_names: list, response: str, tool_calls: list, confidence: float = None,
+            last_brand: str = None):
+        """Store an answer built only from these brand rows, at their current versions"""
+        versions = brand_versions(self.db_path, brand_names)
+        if len(versions) != len(set(brand_names)):
+            return  # a brand is missing or stale: the next ask should re-check it
+
+        entry = {
+            "response": response,
+            "tool_calls": tool_calls,
+            "confidence": confidence,
+            "last_brand": last_brand,
+            "versions": versions,
+            "expires_at": time.monotonic() + self.ttl_seconds
+        }
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            for name in versions:
+                self._by_brand.setdefault(name.lower(), set()).add(key)
+            self.stats["stored"] += 1
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.stats["evicted"] += 1
+
+    def invalidate_brand(self, brand_name: str):
+        """Drop every answer that referenced this brand (called on save)"""
+        with self._lock:
+            for key in self._by_brand.pop(brand_name.lower(), set()):
+                if key in self._entries:
+                    self._remove(key)
+                    self.stats["invalidated"] += 1
+
+    def _remove(self, key: tuple):
+        entry = self._entries.pop(key, None)
+        if entry:
+            for name in entry["versions"]:
+                keys = self._by_brand.get(name.lower())
+                if keys:
+                    keys.discard(key)
+                    if not keys:
+                        del self._by_brand[name.lower()]
+
+
+def get_response_cache(db_path: str, max_entries: int = 500, ttl_seconds: float = 3600) -> ResponseCache:
+    """Process-wide response cache per database file, shared by every agent session"""
+    with _caches_lock:
+        cache = _caches.get(db_path)
+        if cache is None:
+            cache = ResponseCache(db_path, max_entries, ttl_seconds)
+            _caches[db_path] = cache
+        return cache
@@ -0,0 +1,181 @@
+"""
+ConsciousCart - LLM Call Scheduler
+One process-wide gate in front of messages.create: interactive chat goes first, batch jobs
+next, background work (prefetch, refresh) last, with per-class concurrency limits,
+capacity held back for interactive calls and queue-time metrics per class
+"""
+import contextvars
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Lower value = served first
+PRIORITIES = {"interactive": 0, "batch": 1, "background": 2}
+
+# Priority of the work running in this context; chat turns are interactive unless marked otherwise
+_priority = contextvars.ContextVar("cc_llm_priority", default="interactive")
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+class LLMCallPreempted(Exception):
+    """A queued low-priority call was dropped to keep capacity for higher-priority work"""
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+@contextmanager
+def priority(name: str):
+    """Run the enclosed work (and every LLM call it makes) at this priority class"""
+    if name not in PRIORITIES:
+        raise ValueError(f"Unknown priority class: {name}")
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class _Waiter:
+    __slots__ = ("priority", "enqueued", "granted", "preempted")
+
+    def __init__(self, priority: str):
+        self.priority = priority
+        self.enqueued = time.monotonic()
+        self.granted = False
+        self.preempted = False
+
+
+class LLMScheduler:
+    """Priority queue of LLM call slots with per-class limits and a reserve for interactive calls"""
+
+    def __init__(self, max_concurrency: int = 8, class_limits: dict = None,
+                 reserved_interactive: int = 2, max_wait_seconds: dict = None):
+        self.max_concurrency = max_concurrency
+        self.class_limits = {"interactive": max_concurrency, "batch": max_concurrency, "background": max_concurrency}
+        self.class_limits.update(class_limits or {})
+        self.reserved_interactive = min(reserved_interactive, max_concurrency - 1)
+        # Queued calls of these classes are dropped once they've waited this long
+        self.max_wait_seconds = {"background": 30.0}
+        self.max_wait_seconds.update(max_wait_seconds or {})
+
+        self._cond = threading.Condition()
+        self._queue = []  # (priority rank, sequence, waiter), sorted when granting
+        self._sequence = itertools.count()
+        self._running = {name: 0 for name in PRIORITIES}
+
+        self._metrics = {
+            name: {"submitted": 0, "completed": 0, "preempted": 0, "timed_out": 0,
+                   "queue_ms": deque(maxlen=1000)}
+            for name in PRIORITIES
+        }
+
+    def _can_run(self, priority: str) -> bool:
+        total = sum(self._running.values())
+        if total >= self.max_concurrency or self._running[priority] >= self.class_limits[priority]:
+            return False
+        # Lower classes never take the slots held back for interactive calls
+        return priority == "interactive" or total < self.max_concurrency - self.reserved_interactive
+
+    def _grant_waiters(self):
+        """Wake the best queued waiter of each class that may run now, highest class first"""
+        now = time.monotonic()
+        blocked = set()
+        for rank, sequence, waiter in sorted(self._queue):
+            if waiter.priority in blocked:
+                continue
+            max_wait = self.max_wait_seconds.get(waiter.priority)
+            if max_wait is not None and now - waiter.enqueued > max_wait:
+                waiter.preempted = True
+                continue
+            if self._can_run(waiter.priority):
+                waiter.granted = True
+                self._running[waiter.priority] += 1
+            else:
+                # FIFO within a class: nobody behind this waiter overtakes it
+                blocked.add(waiter.priority)
+        self._queue = [entry for entry in self._queue if not (entry[2].granted or entry[2].preempted)]
+        self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority: str = None, timeout: float = None):
+        """Hold one LLM call slot for the enclosed call; yields the time spent queued in ms"""
+        priority = priority or current_priority()
+        waiter = _Waiter(priority)
+        metrics = self._metrics[priority]
+
+        with self._cond:
+            metrics["submitted"] += 1
+            self._queue.append((PRIORITIES[priority], next(self._sequence), waiter))
+            self._grant_waiters()
+            deadline = time.monotonic() + timeout if timeout is not None else None
+            while not waiter.granted:
+                if waiter.preempted:
+                    metrics["preempted"] += 1
+                    raise LLMCallPreempted(f"{priority} LLM call preempted after queueing")
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    self._queue = [entry for entry in self._queue if entry[2] is not waiter]
+                    metrics["timed_out"] += 1
+                    raise TimeoutError(f"{priority} LLM call waited {timeout:.1f}s for a slot")
+                # Wake periodically so over-age background waiters get preempted
+                self._cond.wait(min(remaining, 1.0) if remaining is not None else 1.0)
+                self._grant_waiters()
+
+            queue_ms = (time.monotonic() - waiter.enqueued) * 1000
+            metrics["queue_ms"].append(queue_ms)
+
+        try:
+            yield queue_ms
+        finally:
+            with self._cond:
+                self._running[priority] -= 1
+                metrics["completed"] += 1
+                self._grant_waiters()
+
+    def stats(self) -> dict:
+        """Per-class counters, live running/queued counts and queue-time percentiles"""
+        with self._cond:
+            report = {}
+            for name, metrics in self._metrics.items():
+                waits = sorted(metrics["queue_ms"])
+
+                def pct(p):
+                    return round(waits[min(len(waits) - 1, int(p / 100 * len(waits)))], 2) if waits else None
+
+                report[name] = {
+                    "submitted": metrics["submitted"],
+                    "completed": metrics["completed"],
+                    "preempted": metrics["preempted"],
+                    "timed_out": metrics["timed_out"],
+                    "running": self._running[name],
+                    "queued": sum(1 for entry in self._queue if entry[2].priority == name),
+                    "queue_ms_p50": pct(50),
+                    "queue_ms_p95": pct(95),
+                    "queue_ms_max": round(waits[-1], 2) if waits else None
+                }
+            return report
+
+
+def get_scheduler() -> LLMScheduler:
+    """Process-wide scheduler shared by every agent session (limits via CC_LLM_* env vars)"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            max_concurrency = int(os.getenv("CC_LLM_CONCURRENCY", 8))
+            _scheduler = LLMScheduler(
+                max_concurrency=max_concurrency,
+                class_limits={
+                    "batch": int(os.getenv("CC_LLM_BATCH_CONCURRENCY", max_concurrency)),
+                    "background": int(os.getenv("CC_LLM_BACKGROUND_CONCURRENCY", max_concurrency))
+                },
+                reserved_interactive=int(os.getenv("CC_LLM_INTERACTIVE_RESERVE", 2)),
+                max_wait_seconds={"background": float(os.getenv("CC_LLM_BACKGROUND_MAX_WAIT", 30))}
+            )
+        return _scheduler
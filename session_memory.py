@@ -0,0 +1,104 @@
+"""
+ConsciousCart - Session Memory
+Compact, bounded record of what this conversation already established (brand verdicts,
+parents, search notes, alternatives with prices), rendered into each prompt under a token cap
+"""
+from collections import OrderedDict
+
+from brand_names import normalize_brand_name
+
+# Rough prompt-size estimate; good enough to keep the block under its cap
+CHARS_PER_TOKEN = 4
+
+
+class SessionMemory:
+    """LRU of brand facts and alternative lists from earlier turns of one session"""
+
+    def __init__(self, max_brands: int = 8, max_categories: int = 3, max_tokens: int = 400):
+        self.max_brands = max_brands
+        self.max_categories = max_categories
+        self.max_tokens = max_tokens
+
+        self._brands = OrderedDict()  # normalized name -> facts
+        self._alternatives = OrderedDict()  # category -> [(brand, product, price, tags)]
+
+    def __bool__(self):
+        return bool(self._brands or self._alternatives)
+
+    def _touch(self, store: OrderedDict, key, value, limit: int):
+        store[key] = value
+        store.move_to_end(key)
+        while len(store) > limit:
+            store.popitem(last=False)
+
+    def remember_brand(self, result: dict):
+        """A check_database result or a saved verdict"""
+        key = normalize_brand_name(result["brand_name"])
+        facts = self._brands.get(key, {})
+        facts.update({
+            "name": result["brand_name"],
+            "is_cruelty_free": result["is_cruelty_free"],
+            "parent_company": result.get("parent_company") or facts.get("parent_company"),
+            "confidence": result.get("confidence", facts.get("confidence")),
+            "sources": result.get("sources") or facts.get("sources") or [],
+            "is_stale": result.get("is_stale", False)
+        })
+        self._touch(self._brands, key, facts, self.max_brands)
+
+    def remember_search(self, brand_name: str, query: str, result: dict):
+        """What a web search about a brand concluded (e.g. vegan status), as a short note"""
+        key = normalize_brand_name(brand_name)
+        facts = self._brands.get(key, {"name": brand_name, "is_cruelty_free": None})
+        assessment = result.get("assessment", {})
+        verdict = {True: "cruelty-free", False: "NOT cruelty-free"}.get(assessment.get("is_cruelty_free"), "inconclusive")
+        notes = facts.setdefault("notes", [])
+        notes.append(f'searched "{query[:60]}" (sources: {verdict}): {" ".join(result.get("summary", "").split())[:160]}')
+        del notes[:-2]
+        self._touch(self._brands, key, facts, self.max_brands)
+
+    def remember_alternatives(self, result: dict):
+        """A find_alternatives result"""
+        picks = [
+            (alt["brand"], alt["product"], alt["price"],
+             [tag for tag, flag in (("vegan", alt["vegan"]), ("fragrance-free", alt["fragrance_free"])) if flag])
+            for alt in result.get("alternatives", [])
+        ]
+        if picks:
+            self._touch(self._alternatives, result["category"], picks, self.max_categories)
+
+    def _brand_line(self, facts: dict) -> str:
+        status = {True: "cruelty-free", False: "NOT cruelty-free"}.get(facts.get("is_cruelty_free"), "unverified")
+        parts = [f"- {facts['name']}: {status}"]
+        if facts.get("parent_company"):
+            parts.append(f"parent {facts['parent_company']}")
+        if facts.get("confidence") is not None:
+            parts.append(f"confidence {facts['confidence']:.2f}")
+        if facts.get("sources"):
+            parts.append("sources " + "/".join(facts["sources"][:3]))
+        if facts.get("is_stale"):
+            parts.append("STALE")
+        line = ", ".join(parts)
+        for note in facts.get("notes", []):
+            line += f"\n  {note}"
+        return line
+
+    def render(self) -> str:
+        """Prompt block, most recent facts first, trimmed to max_tokens"""
+        if not self:
+            return ""
+        lines = [self._brand_line(facts) for facts in reversed(self._brands.values())]
+        for category, picks in reversed(self._alternatives.items()):
+            lines.append(f"- {category} alternatives: " + "; ".join(
+                f"{brand} {product} ${price:.0f}" + (f" ({', '.join(tags)})" if tags else "")
+                for brand, product, price, tags in picks
+            ))
+
+        header = "SESSION MEMORY (verified earlier in this conversation; answer from it instead of re-checking unless STALE):"
+        budget = self.max_tokens * CHARS_PER_TOKEN - len(header)
+        kept = []
+        for line in lines:
+            if len(line) + 1 > budget:
+                break
+            kept.append(line)
+            budget -= len(line) + 1
+        return header + "\n" + "\n".join(kept) if kept else ""
@@ -0,0 +1,176 @@
+"""
+ConsciousCart - Read-Only Brand Snapshots
+Compact, versioned, memory-mapped export of verified brands for fast cold start
+and edge replicas that serve check_database without SQLite
+
+File layout (little-endian):
+    header   magic b"CCBRANDS", version, key count, record count, created_at
+    index    key count x (key offset, key length, record offset), sorted by key
+    keys     concatenated UTF-8 alias keys
+    records  record count x (length, JSON record)
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+
+from brand_names import brand_aliases, normalize_brand_name
+
+MAGIC = b"CCBRANDS"
+VERSION = 1
+HEADER = struct.Struct("<8sHIIQ")
+INDEX_ENTRY = struct.Struct("<IIQ")
+RECORD_LENGTH = struct.Struct("<I")
+
+
+def export_snapshot(db_path: str, snapshot_path: str) -> dict:
+    """Write every brand in brands.db to a snapshot file, replacing the old one atomically"""
+    import sqlite3
+
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT name, is_cruelty_free, parent_company, explanation, sources,
+               last_verified, confidence, sources_count, expires_at
+        FROM brands
+        ORDER BY name
+    """)
+    rows = cursor.fetchall()
+    conn.close()
+
+    records = bytearray()
+    record_offsets = []
+    keys = {}
+    for (name, is_cf, parent, explanation, sources, last_verified,
+         confidence, sources_count, expires_at) in rows:
+        payload = json.dumps({
+            "brand_name": name,
+            "is_cruelty_free": bool(is_cf),
+            "parent_company": parent,
+            "explanation": explanation,
+            "sources": sources.split(",") if sources else [],
+            "last_verified": last_verified,
+            "confidence": confidence,
+            "sources_count": sources_count,
+            "expires_at": expires_at
+        }, ensure_ascii=False).encode("utf-8")
+        record_offsets.append(len(records))
+        records += RECORD_LENGTH.pack(len(payload)) + payload
+
+        for alias in brand_aliases(name):
+            # An exact name beats another brand's shortened alias
+            if alias not in keys or alias == normalize_brand_name(name):
+                keys[alias] = len(record_offsets) - 1
+
+    sorted_keys = sorted((alias.encode("utf-8"), record) for alias, record in keys.items())
+    keys_start = HEADER.size + INDEX_ENTRY.size * len(sorted_keys)
+    key_blob = b"".join(key for key, _ in sorted_keys)
+    records_start = keys_start + len(key_blob)
+
+    index = bytearray()
+    key_offset = 0
+    for key, record in sorted_keys:
+        index += INDEX_ENTRY.pack(key_offset, len(key), records_start + record_offsets[record])
+        key_offset += len(key)
+
+    tmp_path = f"{snapshot_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(sorted_keys), len(rows), int(time.time())))
+        f.write(index)
+        f.write(key_blob)
+        f.write(records)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, snapshot_path)
+
+    return {"path": snapshot_path, "brands": len(rows), "keys": len(sorted_keys),
+            "bytes": os.path.getsize(snapshot_path)}
+
+
+class BrandSnapshot:
+    """One memory-mapped snapshot; lookups binary-search the mapped index in place"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, key_count, record_count, created_at = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a brand snapshot")
+        if version != VERSION:
+            raise ValueError(f"Unsupported snapshot version {version} (expected {VERSION})")
+
+        self.key_count = key_count
+        self.brand_count = record_count
+        self.created_at = created_at
+        self._keys_start = HEADER.size + INDEX_ENTRY.size * key_count
+
+    def _key_at(self, i: int) -> tuple:
+        key_offset, key_length, record_offset = INDEX_ENTRY.unpack_from(self._mm, HEADER.size + i * INDEX_ENTRY.size)
+        start = self._keys_start + key_offset
+        return self._mm[start:start + key_length], record_offset
+
+    def _find(self, key: bytes):
+        lo, hi = 0, self.key_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_key, record_offset = self._key_at(mid)
+            if mid_key < key:
+                lo = mid + 1
+            elif mid_key > key:
+                hi = mid
+            else:
+                return record_offset
+        return None
+
+    def lookup(self, brand_name: str) -> dict:
+        """Record for a brand name or alias, or None"""
+        normalized = normalize_brand_name(brand_name)
+        for key in (normalized, normalized.replace(" ", "")):
+            record_offset = self._find(key.encode("utf-8"))
+            if record_offset is not None:
+                (length,) = RECORD_LENGTH.unpack_from(self._mm, record_offset)
+                start = record_offset + RECORD_LENGTH.size
+                return json.loads(self._mm[start:start + length].decode("utf-8"))
+        return None
+
+
+class SnapshotStore:
+    """Serves check_database from the current snapshot; reload() hot-swaps in a new one"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.current = BrandSnapshot(path)
+
+    def reload(self, path: str = None) -> BrandSnapshot:
+        """Open a new snapshot fully, then swap it in; in-flight lookups finish on the old one"""
+        snapshot = BrandSnapshot(path or self.path)
+        with self._lock:
+            self.path = snapshot.path
+            self.current = snapshot
+        return snapshot
+
+    def check_database(self, brand_name: str) -> dict:
+        """Same result shape as ConsciousCartAgent._check_database"""
+        record = self.current.lookup(brand_name)
+        if record is None:
+            return {"found": False}
+
+        now = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+        record["is_stale"] = bool(record["expires_at"]) and record["expires_at"] <= now
+        return {"found": True, **record}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 4 and sys.argv[1] == "export":
+        print(export_snapshot(sys.argv[2], sys.argv[3]))
+    elif len(sys.argv) >= 4 and sys.argv[1] == "lookup":
+        print(SnapshotStore(sys.argv[2]).check_database(" ".join(sys.argv[3:])))
+    else:
+        print("Usage: python snapshot.py export <brands.db> <brands.snap>")
+        print("       python snapshot.py lookup <brands.snap> <brand name>")
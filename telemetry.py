@@ -0,0 +1,128 @@
+"""
+ConsciousCart - Query Telemetry
+Per-query latency, token spend and cache counters in brands.db, written through the
+write-behind queue and read by the inspector CLI (debug_agent.py). Query text is stored
+as a digest unless CC_TELEMETRY_RAW_QUERIES=1
+"""
+import json
+import os
+
+from tracing import redact
+
+RETENTION_DAYS = 30
+RAW_QUERIES = os.getenv("CC_TELEMETRY_RAW_QUERIES", "0") == "1"
+
+
+def init_telemetry(cursor):
+    """Create the query_log table and prune rows past retention"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS query_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            query TEXT,
+            brands TEXT,
+            handled_by TEXT,
+            latency_ms FLOAT,
+            llm_calls INTEGER,
+            tool_calls INTEGER,
+            input_tokens INTEGER,
+            output_tokens INTEGER,
+            budget_hit TEXT,
+            cache_stats TEXT
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_query_log_created_at ON query_log(created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_query_log_latency ON query_log(latency_ms)")
+    cursor.execute("DELETE FROM query_log WHERE created_at < datetime('now', ?)", (f"-{RETENTION_DAYS} days",))
+
+    # Raw text logged before digests (or while raw logging was on) doesn't wait out retention
+    if not RAW_QUERIES:
+        cursor.execute("SELECT id, query FROM query_log WHERE query NOT LIKE 'sha1:%'")
+        cursor.executemany("UPDATE query_log SET query = ? WHERE id = ?", [
+            (redact(query), row_id) for row_id, query in cursor.fetchall()
+        ])
+
+
+def write_query_records(cursor, records: list):
+    """Write-behind batch writer for query_log rows"""
+    cursor.executemany("""
+        INSERT INTO query_log
+        (query, brands, handled_by, latency_ms, llm_calls, tool_calls,
+         input_tokens, output_tokens, budget_hit, cache_stats)
+        VALUES (:query, :brands, :handled_by, :latency_ms, :llm_calls, :tool_calls,
+                :input_tokens, :output_tokens, :budget_hit, :cache_stats)
+    """, [
+        {
+            **record,
+            "query": record["query"] if RAW_QUERIES else redact(record["query"]),
+            "brands": json.dumps(record["brands"]),
+            "cache_stats": json.dumps(record["cache_stats"])
+        }
+        for record in records
+    ])
+
+
+def slowest_queries(cursor, since: str, limit: int = 10) -> list:
+    """Slowest queries since a timestamp"""
+    cursor.execute("""
+        SELECT created_at, latency_ms, handled_by, llm_calls, tool_calls,
+               input_tokens + output_tokens, budget_hit, query
+        FROM query_log
+        WHERE created_at >= ?
+        ORDER BY latency_ms DESC
+        LIMIT ?
+    """, (since, limit))
+    return cursor.fetchall()
+
+
+def token_spend(cursor, since: str) -> dict:
+    """Query count, token totals and latency summary since a timestamp"""
+    cursor.execute("""
+        SELECT COUNT(*), COALESCE(SUM(input_tokens), 0), COALESCE(SUM(output_tokens), 0),
+               COALESCE(AVG(latency_ms), 0), COALESCE(SUM(llm_calls), 0),
+               SUM(handled_by != 'llm'), SUM(budget_hit IS NOT NULL)
+        FROM query_log
+        WHERE created_at >= ?
+    """, (since,))
+    queries, input_tokens, output_tokens, avg_latency, llm_calls, local, budget_hits = cursor.fetchone()
+    return {
+        "queries": queries,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "avg_latency_ms": round(avg_latency, 1),
+        "llm_calls": llm_calls,
+        "answered_without_llm": local or 0,
+        "budget_exhausted": budget_hits or 0
+    }
+
+
+def cache_ratios(cursor, since: str) -> dict:
+    """Hits, misses and hit ratio per cache, plus the most recently reported size"""
+    cursor.execute("""
+        SELECT cache_stats FROM query_log
+        WHERE created_at >= ? AND cache_stats IS NOT NULL
+        ORDER BY id
+    """, (since,))
+
+    totals = {}
+    for (raw,) in cursor.fetchall():
+        for name, stats in json.loads(raw).items():
+            entry = totals.setdefault(name, {"hits": 0, "misses": 0, "size": 0})
+            entry["hits"] += stats.get("hits", 0)
+            entry["misses"] += stats.get("misses", 0)
+            entry["size"] = stats.get("size", entry["size"])
+
+    for entry in totals.values():
+        lookups = entry["hits"] + entry["misses"]
+        entry["hit_ratio"] = entry["hits"] / lookups if lookups else 0.0
+    return totals
+
+
+def hottest_brands(cursor, since: str) -> dict:
+    """How often each brand came up in queries since a timestamp"""
+    cursor.execute("SELECT brands FROM query_log WHERE created_at >= ? AND brands != '[]'", (since,))
+    counts = {}
+    for (raw,) in cursor.fetchall():
+        for brand in json.loads(raw):
+            counts[brand.lower()] = counts.get(brand.lower(), 0) + 1
+    return counts
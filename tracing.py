@@ -0,0 +1,214 @@
+"""
+ConsciousCart - Request Tracing
+Hierarchical spans (query, loop iteration, LLM call, tool, nested search, DB) with timings
+and attributes, kept on the agent for the Research Process waterfall; a small sample is
+appended to a size-capped, rotated JSONL file by a background thread, user text redacted
+"""
+import atexit
+import contextvars
+import hashlib
+import json
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Innermost open span of the trace running in this context (None: not traced)
+_current_span = contextvars.ContextVar("cc_current_span", default=None)
+
+# Span attributes holding user text; exported as a digest only
+REDACTED_ATTRIBUTES = {"query", "input"}
+
+_exporters = {}
+_exporters_lock = threading.Lock()
+
+
+class Span:
+    """One timed operation inside a trace"""
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start", "end", "attributes")
+
+    def __init__(self, trace, name: str, parent_id, attributes: dict):
+        self.trace = trace
+        self.span_id = len(trace.spans)
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start = time.perf_counter()
+        self.end = None
+        trace.spans.append(self)
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> dict:
+        end = self.end if self.end is not None else time.perf_counter()
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ms": round((self.start - self.trace.start) * 1000, 2),
+            "duration_ms": round((end - self.start) * 1000, 2),
+            "attributes": self.attributes
+        }
+
+
+class _NoopSpan:
+    """Stand-in yielded when the current request isn't sampled"""
+
+    def set(self, **attributes):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """All spans of one request; the first span is the root"""
+
+    def __init__(self, name: str, attributes: dict):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.spans = []
+        self.root = Span(self, name, None, attributes)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name,
+            "started_at": self.started_at,
+            "duration_ms": self.root.to_dict()["duration_ms"],
+            "spans": [span.to_dict() for span in self.spans]
+        }
+
+
+def redact(value) -> str:
+    """Digest and length of user text: groups repeats without storing what was said"""
+    text = str(value)
+    return f"sha1:{hashlib.sha1(text.encode('utf-8')).hexdigest()[:12]} len:{len(text)}"
+
+
+def _redacted(trace: dict) -> dict:
+    # New attribute dicts: to_dict shares them with the in-memory trace the UI shows
+    for span in trace["spans"]:
+        span["attributes"] = {
+            key: redact(value) if key in REDACTED_ATTRIBUTES else value
+            for key, value in span["attributes"].items()
+        }
+    return trace
+
+
+class TraceExporter:
+    """Appends traces to a JSONL file on a background thread, rotating it at max_bytes"""
+
+    def __init__(self, path: str, max_bytes: int = 10 * 1024 * 1024, backups: int = 3, max_queue: int = 1000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+
+        # Full queue drops the trace: exporting must never slow a request down
+        self._queue = queue.Queue(maxsize=max_queue)
+        self.stats = {"exported": 0, "dropped": 0, "rotations": 0, "errors": 0}
+
+        self._thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def submit(self, trace):
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.stats["dropped"] += 1
+
+    def flush(self):
+        """Wait until every submitted trace is written"""
+        self._queue.join()
+
+    def _rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.stats["rotations"] += 1
+
+    def _run(self):
+        while True:
+            trace = self._queue.get()
+            try:
+                line = json.dumps(_redacted(trace.to_dict()), default=str) + "\n"
+                if os.path.exists(self.path) and os.path.getsize(self.path) + len(line) > self.max_bytes:
+                    self._rotate()
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+                self.stats["exported"] += 1
+            except (OSError, TypeError, ValueError) as e:
+                self.stats["errors"] += 1
+                print(f"[Tracing] Export failed: {e}")
+            finally:
+                self._queue.task_done()
+
+
+def get_exporter(path: str, max_bytes: int = 10 * 1024 * 1024, backups: int = 3) -> TraceExporter:
+    """Process-wide exporter per file, shared by every agent session"""
+    with _exporters_lock:
+        exporter = _exporters.get(path)
+        if exporter is None:
+            exporter = TraceExporter(path, max_bytes, backups)
+            _exporters[path] = exporter
+        return exporter
+
+
+class Tracer:
+    """Traces requests for the UI; exports a sample of finished traces"""
+
+    def __init__(self, sample_rate: float = 1.0, export_rate: float = 0.01, exporter: TraceExporter = None):
+        self.sample_rate = sample_rate  # traced in memory (Research Process waterfall)
+        self.export_rate = export_rate  # of those, also written to the exporter's file
+        self.exporter = exporter
+
+    @contextmanager
+    def trace(self, name: str, **attributes):
+        """Root span of a request, or None when it isn't sampled or a trace is already open"""
+        if _current_span.get() is not None or random.random() >= self.sample_rate:
+            yield None
+            return
+
+        trace = Trace(name, attributes)
+        token = _current_span.set(trace.root)
+        try:
+            yield trace
+        except Exception as e:
+            trace.root.set(error=f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            trace.root.end = time.perf_counter()
+            _current_span.reset(token)
+            if self.exporter and random.random() < self.export_rate:
+                self.exporter.submit(trace)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Child of the innermost open span; a no-op outside a sampled trace"""
+    parent = _current_span.get()
+    if parent is None:
+        yield NOOP_SPAN
+        return
+
+    child = Span(parent.trace, name, parent.span_id, attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except Exception as e:
+        child.set(error=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        child.end = time.perf_counter()
+        _current_span.reset(token)
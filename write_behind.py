@@ -0,0 +1,134 @@
+"""
+ConsciousCart - Write-Behind Queue
+Group-commits brand writes on a background thread so saves don't wait on SQLite's writer lock
+"""
+import atexit
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+class WriteBehindQueue:
+    """Coalesces writes per key and commits them in batches every few milliseconds or N rows"""
+
+    def __init__(self, db_path: str, write_batch, flush_interval: float = 0.005, max_batch: int = 200):
+        self.db_path = db_path
+        self.write_batch = write_batch  # write_batch(cursor, records) inside one transaction
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+
+        self._pending = OrderedDict()
+        self._in_flight = {}
+        self._attempts = {}
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self.stats = {"submitted": 0, "coalesced": 0, "batches": 0, "rows_written": 0, "errors": 0}
+
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, key: str, record: dict):
+        """Queue a record; a later record with the same key replaces it"""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Write-behind queue is closed")
+            self.stats["submitted"] += 1
+            if key in self._pending:
+                self.stats["coalesced"] += 1
+                self._pending.move_to_end(key)
+            self._pending[key] = record
+            # Wake the writer on the first record of a batch and again when the batch is full
+            if len(self._pending) == 1 or len(self._pending) >= self.max_batch:
+                self._cond.notify_all()
+
+    def get_pending(self, key: str):
+        """Newest not-yet-committed record for a key (read-your-writes), or None"""
+        with self._cond:
+            return self._pending.get(key) or self._in_flight.get(key)
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Block until everything queued so far is committed"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify_all()
+            while self._pending or self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self):
+        """Flush and stop the writer thread"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout=10.0)
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA synchronous=NORMAL")
+
+        while True:
+            with self._cond:
+                if not self._pending and not self._closed:
+                    self._cond.wait()
+                # Let a burst accumulate unless the batch is already full
+                if self._pending and len(self._pending) < self.max_batch and not self._closed:
+                    self._cond.wait(self.flush_interval)
+                if not self._pending:
+                    if self._closed:
+                        break
+                    continue
+
+                self._in_flight = dict(self._pending)
+                self._pending.clear()
+
+            batch = list(self._in_flight.values())
+            try:
+                cursor = conn.cursor()
+                cursor.execute("BEGIN IMMEDIATE")
+                self.write_batch(cursor, batch)
+                conn.commit()
+                self.stats["batches"] += 1
+                self.stats["rows_written"] += len(batch)
+                self._attempts.clear()
+            except Exception as e:
+                conn.rollback()
+                self.stats["errors"] += 1
+                print(f"[Write-Behind] Batch of {len(batch)} failed: {e}")
+                # Retry later unless a newer write for the same key arrived meanwhile
+                with self._cond:
+                    for key, record in self._in_flight.items():
+                        self._attempts[key] = self._attempts.get(key, 0) + 1
+                        if self._attempts[key] >= 3:
+                            print(f"[Write-Behind] Dropping {key} after 3 failed attempts")
+                            del self._attempts[key]
+                        else:
+                            self._pending.setdefault(key, record)
+                time.sleep(0.1)
+
+            with self._cond:
+                self._in_flight = {}
+                self._cond.notify_all()
+
+        conn.close()
+
+
+def get_writer(db_path: str, write_batch) -> WriteBehindQueue:
+    """Process-wide queue per database file and writer, shared by every agent session"""
+    key = (db_path, write_batch.__name__)
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None or writer._closed:
+            writer = WriteBehindQueue(db_path, write_batch)
+            _writers[key] = writer
+        return writer